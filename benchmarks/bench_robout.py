@@ -0,0 +1,200 @@
+"""
+Benchmark suite of the robout scaler.
+
+Times fit_transform, transform and inverse_transform, and measures their
+peak allocated memory (tracemalloc), for every normalization mode over a
+grid of rows x columns of synthetic heavy-tailed data. The data mixes float
+columns (Student t with 2 degrees of freedom and a few inf values), int
+columns, a string column and an ignored column. Results are saved as JSON
+so that two runs (e.g. two commits) can be compared. The cold import time
+of robout (on top of numpy) is measured in fresh interpreters, along with
+whether pandas got imported.
+
+Usage:
+
+    python benchmarks/bench_robout.py [--quick] [--output results.json]
+    python benchmarks/bench_robout.py --compare old.json new.json
+
+--quick runs a small grid in a few seconds, meant for CI. Grid points with
+more than --max-cells values are skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import robout as rbt  # noqa: E402
+
+ROWS = [1000, 10000, 100000, 1000000, 10000000]
+COLS = [10, 100, 1000, 10000]
+QUICK_ROWS = [1000, 10000]
+QUICK_COLS = [10, 100]
+
+
+def makeData(nrows, ncols, seed=0):
+    """
+    Synthetic dataframe of nrows x ncols: a string id column, an ignored int
+    time column, 1/5 of int columns and heavy-tailed float columns with inf
+    values.
+    """
+    rng = np.random.default_rng(seed)
+    data = {"id": np.char.add("x", rng.integers(0, 1000, nrows).astype(str)),
+            "time": np.arange(nrows, dtype=np.int64)}
+    for j in range(max(ncols - 2, 1)):
+        if j % 5 == 4:
+            data["c%d" % j] = rng.integers(-100, 100, nrows)
+        else:
+            v = rng.standard_t(2, nrows) * (j + 1)
+            v[rng.random(nrows) < 1e-4] = np.inf
+            v[rng.random(nrows) < 1e-4] = -np.inf
+            data["c%d" % j] = v
+    return pd.DataFrame(data)
+
+
+def measure(fun, *args, repeat=1):
+    """
+    Best wall time over repeat runs of fun(*args), the peak memory
+    allocated during the first one (bytes) and its result.
+    """
+    tracemalloc.start()
+    t = time.perf_counter()
+    res = fun(*args)
+    times = [time.perf_counter() - t]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    for _ in range(repeat - 1):
+        t = time.perf_counter()
+        fun(*args)
+        times.append(time.perf_counter() - t)
+    return min(times), peak, res
+
+
+def run(rows, cols, max_cells, repeat):
+    results = []
+    for nrows in rows:
+        for ncols in cols:
+            if nrows * ncols > max_cells:
+                continue
+            df = makeData(nrows, ncols)
+            for normalization in (0, 1, 2):
+                rs = rbt.robout_scaler(normalization=normalization, ignore=["time"])
+                entry = {"rows": nrows, "cols": ncols, "normalization": normalization}
+                arg = df
+                for name, fun in [("fit_transform", rs.fit_transform),
+                                  ("transform", rs.transform),
+                                  ("inverse_transform", rs.inverse_transform)]:
+                    seconds, peak, res = measure(fun, arg, repeat=repeat)
+                    # the scaled data is the input of inverse_transform
+                    arg = df if name == "fit_transform" else res
+                    entry[name] = {"seconds": seconds, "peak_bytes": peak,
+                                   "rows_per_sec": nrows / seconds}
+                results.append(entry)
+                print("%8d x %5d norm %d  fit %.3fs  transform %.3fs  inverse %.3fs" % (
+                    nrows, ncols, normalization, entry["fit_transform"]["seconds"],
+                    entry["transform"]["seconds"], entry["inverse_transform"]["seconds"]))
+    return results
+
+
+IMPORT_CODE = """
+import json, sys, time
+t = time.perf_counter()
+import numpy
+t1 = time.perf_counter()
+import robout
+t2 = time.perf_counter()
+print(json.dumps({"numpy_seconds": t1 - t, "robout_seconds": t2 - t1,
+                  "pandas_imported": "pandas" in sys.modules}))
+"""
+
+
+def importTime(repeat=5):
+    """
+    Best import time of numpy and of robout on top of it over repeat fresh
+    interpreters, and whether importing robout imported pandas.
+    """
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    env = dict(os.environ, PYTHONPATH=root)
+    runs = [json.loads(subprocess.run([sys.executable, "-c", IMPORT_CODE], env=env,
+                                      capture_output=True, text=True, check=True).stdout)
+            for _ in range(repeat)]
+    return {"numpy_seconds": min(r["numpy_seconds"] for r in runs),
+            "robout_seconds": min(r["robout_seconds"] for r in runs),
+            "pandas_imported": any(r["pandas_imported"] for r in runs)}
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(old, new, threshold):
+    """
+    Prints the relative time change of every benchmark found in both JSON
+    result files and returns the number of regressions beyond threshold.
+    """
+    key = lambda e: (e["rows"], e["cols"], e["normalization"])
+    old, new = json.load(open(old)), json.load(open(new))
+    regressions = 0
+    if "import" in old and "import" in new:
+        ratio = new["import"]["robout_seconds"] / old["import"]["robout_seconds"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print("%-43s %6.2fx%s" % ("import robout", ratio, flag))
+    old = {key(e): e for e in old["results"]}
+    for e in new["results"]:
+        if key(e) not in old:
+            continue
+        for name in ("fit_transform", "transform", "inverse_transform"):
+            ratio = e[name]["seconds"] / old[key(e)][name]["seconds"]
+            flag = ""
+            if ratio > 1 + threshold:
+                regressions += 1
+                flag = "  REGRESSION"
+            print("%8d x %5d norm %d %-17s %6.2fx%s" % (key(e) + (name, ratio, flag)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="small grid for CI")
+    parser.add_argument("--output", default="robout_bench.json")
+    parser.add_argument("--max-cells", type=float, default=1e8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.threshold) else 0
+    rows, cols = (QUICK_ROWS, QUICK_COLS) if args.quick else (ROWS, COLS)
+    imports = importTime()
+    print("import robout %.1fms (numpy %.1fms)%s" % (
+        imports["robout_seconds"]*1000, imports["numpy_seconds"]*1000,
+        ", pandas imported" if imports["pandas_imported"] else ""))
+    results = run(rows, cols, args.max_cells, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump({"commit": commit(), "python": platform.python_version(),
+                   "numpy": np.__version__, "pandas": pd.__version__,
+                   "machine": platform.machine(), "cpus": os.cpu_count(),
+                   "quick": args.quick, "import": imports, "results": results},
+                  f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
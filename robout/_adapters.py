@@ -0,0 +1,145 @@
+"""
+Columnar input and output adapters of the robout scaler.
+
+Structured (record) numpy arrays, dicts of 1d arrays and, when pyarrow is
+installed, Arrow tables and record batches are read column by column
+without building a pandas dataframe: numeric columns are taken as numpy
+views of the container memory (fields of a structured array, the arrays of
+a dict, the Arrow buffers), and the results are returned in a container of
+the same type.
+"""
+import numpy as np
+
+
+def isArrow(data):
+    """
+    True if data is a pyarrow Table or RecordBatch (pyarrow not imported).
+    """
+    return type(data).__module__.startswith("pyarrow") and \
+        type(data).__name__ in ("Table", "RecordBatch")
+
+
+def fromColumnar(data):
+    """
+    Splits a columnar container in columns.
+
+    Parameters
+    ----------
+    data : numpy structured array, dict of 1d arrays, pyarrow Table or
+        RecordBatch. Anything else is not columnar.
+
+    Returns
+    ------
+    None for other inputs, else a tuple (kind, names, columns, strings): kind
+    of container ("struct", "dict" or "arrow"), list of column names, list of
+    columns (numpy 1d arrays for the numeric ones, zero-copy whenever the
+    memory layout allows it, the original columns otherwise) and list of
+    flags of the columns holding values that are not numbers.
+    """
+    if isinstance(data, np.ndarray) and data.dtype.names is not None:
+        if data.ndim != 1:
+            raise ValueError("Structured arrays must be 1d")
+        names = list(data.dtype.names)
+        columns = [data[n] for n in names]
+        kind = "struct"
+    elif isinstance(data, dict):
+        names = list(data)
+        columns = [np.asarray(v) for v in data.values()]
+        if any(c.ndim != 1 for c in columns):
+            raise ValueError("The values of a dict must be 1d arrays, use bind() to "
+                             "scale single records (dicts of scalars)")
+        if len({len(c) for c in columns}) > 1:
+            raise ValueError("All the arrays of the dict must have the same length")
+        kind = "dict"
+    elif isArrow(data):
+        import pyarrow as pa
+        names = list(data.schema.names)
+        columns = []
+        for col in data.columns:
+            if pa.types.is_integer(col.type) or pa.types.is_floating(col.type) or \
+               pa.types.is_boolean(col.type):
+                columns.append(arrowNumpy(col))
+            else:
+                columns.append(col)
+        kind = "arrow"
+    else:
+        return None
+    strings = [isStringColumn(c) for c in columns]
+    return kind, names, columns, strings
+
+
+def arrowNumpy(col):
+    """
+    Numpy view of a numeric Arrow array (or chunked array with a single
+    chunk) free of nulls, else a numpy copy with nulls as nan.
+    """
+    if hasattr(col, "num_chunks") and col.num_chunks == 1:
+        col = col.chunk(0)
+    if col.null_count == 0 and not hasattr(col, "num_chunks"):
+        try:
+            return col.to_numpy(zero_copy_only=True)
+        except Exception:
+            pass
+    return col.to_numpy(zero_copy_only=False)
+
+
+def isStringColumn(col):
+    """
+    True if the column holds values that are not numbers, as isString does
+    for pandas series.
+    """
+    if not isinstance(col, np.ndarray):
+        return True
+    if col.dtype.kind in "biuf":
+        return False
+    if col.dtype.kind == "O":
+        return any(type(v) is str for v in col)
+    return True
+
+
+def groupKeys(col):
+    """
+    Numpy array of the values of a column (e.g. the group_by column).
+    """
+    if isinstance(col, np.ndarray):
+        return col
+    return col.to_numpy(zero_copy_only=False)
+
+
+def columnsBlock(columns, num, dtype=np.float64):
+    """
+    Copies the columns at positions num to a new float block in column-major
+    order, as numericBlock does for dataframes.
+    """
+    X = np.empty((len(columns[0]) if columns else 0, len(num)), dtype=dtype, order="F")
+    for j, c in enumerate(num):
+        X[:, j] = columns[c]
+    return X
+
+
+def toColumnar(kind, data, names, columns, num, Z, isint=None):
+    """
+    Container of the same kind as data with the columns at positions num
+    replaced by the columns of the float block Z (views of it, except for
+    structured arrays), the other columns being passed through. Columns
+    flagged in isint (and free of nan values) are cast to int.
+    """
+    isint = np.zeros(len(num), dtype=bool) if isint is None else isint & np.isfinite(Z).all(axis=0)
+    columns = list(columns)
+    for j, c in enumerate(num):
+        columns[c] = Z[:, j].astype(np.int64) if isint[j] else Z[:, j]
+    if kind == "dict":
+        return dict(zip(names, columns))
+    if kind == "struct":
+        dtype = [(n, c.dtype) for n, c in zip(names, columns)]
+        # np.recarray inputs get a recarray back
+        res = np.empty(len(data), dtype=dtype).view(type(data))
+        for n, c in zip(names, columns):
+            res[n] = c
+        return res
+    import pyarrow as pa
+    scaled = set(num.tolist())
+    arrays = [pa.array(c) if i in scaled else data.column(i) for i, c in enumerate(columns)]
+    if type(data).__name__ == "Table":
+        return pa.Table.from_arrays(arrays, names=names)
+    return pa.RecordBatch.from_arrays(arrays, names=names)
@@ -0,0 +1,502 @@
+"""
+Vectorized numeric engine of the robout scaler.
+
+All functions work on 2d float blocks (rows x columns) and on 1d parameter
+arrays aligned with the columns of the block, so that a whole block is
+fitted and scaled with broadcast operations instead of one python call
+per column.
+"""
+import functools
+import os
+
+import numpy as np
+
+
+def quiet(fun):
+    """
+    Decorator running fun with the floating point warnings of numpy turned
+    off, inf and nan being expected results of the robout kernels (e.g. the
+    sigmoid of outliers). The error state is set around each call, so it is
+    scoped to the kernel and to the thread running it.
+    """
+    @functools.wraps(fun)
+    def wrapper(*args, **kwargs):
+        with np.errstate(over="ignore", under="ignore", invalid="ignore", divide="ignore"):
+            return fun(*args, **kwargs)
+    return wrapper
+
+
+def sortedMedian(S, start, stop):
+    """
+    Median of S[start:stop, j] for each column j of a column-wise sorted
+    block. Columns with an empty slice get nan.
+
+    Parameters
+    ----------
+    S : numpy 2d array sorted along axis 0 (nan values at the end).
+    start, stop : numpy 1d int arrays with the slice bounds of each column.
+
+    Returns
+    ------
+    numpy 1d array with the median of each column slice.
+    """
+    cols = np.arange(S.shape[1])
+    m = stop - start
+    # an empty block (an all nan column of the streaming fit) has no median
+    if S.shape[0] == 0:
+        return np.full(np.shape(m), np.nan)
+    empty = m <= 0
+    last = max(S.shape[0] - 1, 0)
+    lo = np.clip(start + (m - 1) // 2, 0, last)
+    hi = np.clip(start + m // 2, 0, last)
+    a = S[lo, cols]
+    b = S[hi, cols]
+    med = np.where(lo == hi, a, (a + b) / 2)
+    med[empty] = np.nan
+    return med
+
+
+def sortedQuantile(S, n, q, start=0):
+    """
+    Linearly interpolated q quantile of the first n[j] values of each
+    column j of a column-wise sorted block. It reproduces the 'linear'
+    method of numpy.quantile (the one used by pandas), so the result is
+    identical to DataFrame.quantile.
+
+    Parameters
+    ----------
+    S : numpy 2d array sorted along axis 0 (nan values at the end).
+    n : numpy 1d int array with the number of non-nan values per column.
+    q : float between 0 and 1.
+    start : int or numpy int array, row where the values of each column 
+        start (e.g. a column of group offsets, n being then 2d).
+
+    Returns
+    ------
+    numpy 1d array with the quantile of each column.
+    """
+    cols = np.arange(S.shape[1])
+    if S.shape[0] == 0:
+        return np.full(np.shape(n), np.nan)
+    last = np.maximum(n - 1, 0)
+    vi = (n - 1) * q
+    prev = np.floor(vi)
+    gamma = vi - prev
+    prev = prev.astype(np.intp)
+    nxt = prev + 1
+    above = vi >= n - 1
+    prev[above] = last[above]
+    nxt[above] = last[above]
+    a = S[start + prev, cols]
+    b = S[start + nxt, cols]
+    diff = b - a
+    res = a + diff * gamma
+    np.subtract(b, diff * (1 - gamma), out=res, where=gamma >= 0.5)
+    res[n == 0] = np.nan
+    return res
+
+
+@quiet
+def fitStats(X, uppq, lowq):
+    """
+    Descriptive statistics of each column of a float block, computed from a
+    single sort per column: median, uppq and lowq quantiles, the median of
+    the values greater than the uppq quantile (pif) and the median of the
+    values lower than the lowq quantile (nif). nan values are skipped.
+
+    Parameters
+    ----------
+    X : numpy 2d float array.
+    uppq, lowq : floats between 0 and 1.
+
+    Returns
+    ------
+    tuple of numpy 1d arrays (med, upp, low, pif, nif).
+    """
+    S = np.sort(X, axis=0)
+    n = np.count_nonzero(~np.isnan(S), axis=0)
+    med = sortedMedian(S, np.zeros_like(n), n)
+    return (med,) + tailStats(S, n, uppq, lowq)
+
+
+@quiet
+def fitStatsMany(X, pairs):
+    """
+    Descriptive statistics (as fitStats) of each column of a float block for
+    several (uppq, lowq) pairs, all derived from a single sort per column.
+
+    Returns
+    ------
+    the median (numpy 1d array) and a list with the (upp, low, pif, nif) 
+    tuple of numpy 1d arrays of each pair.
+    """
+    S = np.sort(X, axis=0)
+    n = np.count_nonzero(~np.isnan(S), axis=0)
+    med = sortedMedian(S, np.zeros_like(n), n)
+    return med, [tailStats(S, n, uppq, lowq) for uppq, lowq in pairs]
+
+
+def tailStats(S, n, uppq, lowq):
+    """
+    uppq and lowq quantiles of each column of a column-wise sorted block
+    and the medians of the values greater than the first (pif) and lower
+    than the second (nif).
+    """
+    upp = sortedQuantile(S, n, uppq)
+    low = sortedQuantile(S, n, lowq)
+    # nan compares as False so it never enters the counts
+    pif = sortedMedian(S, np.count_nonzero(S <= upp, axis=0), n)
+    nif = sortedMedian(S, np.zeros_like(n), np.count_nonzero(S < low, axis=0))
+    return upp, low, pif, nif
+
+
+@quiet
+def groupStats(X, codes, ngroups, uppq, lowq):
+    """
+    Descriptive statistics (as fitStats) of each column of a float block
+    within each group of rows. The rows are sorted by group and value at
+    once, so that all the groups are reduced together.
+
+    Parameters
+    ----------
+    X : numpy 2d float array.
+    codes : numpy 1d int array, group (0 to ngroups-1) of each row.
+    ngroups : int, number of groups, all of them having rows.
+    uppq, lowq : floats between 0 and 1.
+
+    Returns
+    ------
+    tuple of numpy 2d arrays (med, upp, low, pif, nif), groups x columns.
+    """
+    sizes = np.bincount(codes, minlength=ngroups)
+    starts = np.cumsum(sizes) - sizes
+    keys = np.broadcast_to(codes[:, None], X.shape)
+    S = np.take_along_axis(X, np.lexsort((X, keys), axis=0), axis=0)
+    # group of each row of S
+    rows = np.repeat(np.arange(ngroups), sizes)
+    n = np.add.reduceat(~np.isnan(S), starts, axis=0)
+    start = starts[:, None]
+    med = sortedMedian(S, start, start + n)
+    upp = sortedQuantile(S, n, uppq, start)
+    low = sortedQuantile(S, n, lowq, start)
+    pif = sortedMedian(S, start + np.add.reduceat(S <= upp[rows], starts, axis=0),
+                       start + n)
+    nif = sortedMedian(S, start, start + np.add.reduceat(S < low[rows], starts, axis=0))
+    return med, upp, low, pif, nif
+
+
+@quiet
+def groupMeanStd(Z, codes, ngroups):
+    """
+    Mean and sample standard deviation (as meanStd) of each column of a
+    float block within each group of rows.
+
+    Returns
+    ------
+    tuple of numpy 2d arrays (mea, std), groups x columns.
+    """
+    mea = np.empty((ngroups, Z.shape[1]))
+    std = np.empty((ngroups, Z.shape[1]))
+    for j in range(Z.shape[1]):
+        keep = ~np.isnan(Z[:, j])
+        z = Z[keep, j]
+        g = codes[keep]
+        count = np.bincount(g, minlength=ngroups)
+        mea[:, j] = np.bincount(g, z, ngroups) / count
+        std[:, j] = np.sqrt(np.bincount(g, (mea[g, j] - z) ** 2, ngroups) / (count - 1))
+    return mea, std
+
+
+def intFlags(X):
+    """
+    Flags the columns of a float block holding only finite integer values.
+    """
+    return np.all(np.isfinite(X) & (X == np.trunc(X)), axis=0)
+
+
+@quiet
+def meanStd(Z):
+    """
+    Mean and sample standard deviation (ddof=1) of each column of a float
+    block skipping nan values, computed the same way pandas does.
+    """
+    mask = np.isnan(Z)
+    count = Z.shape[0] - np.count_nonzero(mask, axis=0)
+    avg = np.where(mask, 0, Z).sum(axis=0) / count
+    sqr = (avg - Z) ** 2
+    sqr[mask] = 0
+    std = np.sqrt(sqr.sum(axis=0) / (count - 1))
+    return avg, std
+
+
+@quiet
+def scaledMeanStd(X, med, rng):
+    """
+    Mean and sample standard deviation (as meanStd) of the sigmoid output of
+    each column of a float block, computed over chunks of columns so that
+    the temporaries stay cache sized. The block is overwritten with the
+    sigmoid output.
+    """
+    med = np.asarray(med, dtype=X.dtype)
+    rng = np.asarray(rng, dtype=X.dtype)
+    step = chunkRows(X.shape[0], X.itemsize)
+    mea = np.empty(X.shape[1])
+    std = np.empty(X.shape[1])
+    for a in range(0, X.shape[1], step):
+        c = slice(a, a + step)
+        mea[c], std[c] = meanStd(scaleBlock(X[:, c], med[c], rng[c], 0, 1))
+    return mea, std
+
+
+@quiet
+def scaledMeanStdMany(X, med, rngs):
+    """
+    Mean and sample standard deviation (as scaledMeanStd) of the sigmoid
+    output of each column of a float block for several ranges (upp-low),
+    reading each cache-sized chunk of columns once for all of them. The
+    block is left untouched.
+
+    Returns
+    ------
+    list with the (mea, std) tuple of numpy 1d arrays of each range.
+    """
+    med = np.asarray(med, dtype=X.dtype)
+    rngs = [np.asarray(rng, dtype=X.dtype) for rng in rngs]
+    step = chunkRows(X.shape[0], X.itemsize)
+    res = [(np.empty(X.shape[1]), np.empty(X.shape[1])) for _ in rngs]
+    for a in range(0, X.shape[1], step):
+        c = slice(a, a + step)
+        for (mea, std), rng in zip(res, rngs):
+            blk = np.array(X[:, c], order="F")
+            mea[c], std[c] = meanStd(scaleBlock(blk, med[c], rng[c], 0, 1))
+    return res
+
+
+@quiet
+def scaleBlock(X, med, rng, mea, std):
+    """
+    Robout scaling of a float block: sigmoid of the robust scaled values
+    followed by (s - mea)/std. The block is overwritten with the result.
+    """
+    np.subtract(X, med, out=X)
+    np.negative(X, out=X)
+    np.divide(X, rng, out=X)
+    np.exp(X, out=X)
+    np.add(X, 1, out=X)
+    np.divide(1, X, out=X)
+    np.subtract(X, mea, out=X)
+    np.divide(X, std, out=X)
+    return X
+
+
+@quiet
+def standardizeBlock(X, mea, std):
+    """
+    (x - mea)/std of a float block, overwritten with the result.
+    """
+    np.subtract(X, mea, out=X)
+    np.divide(X, std, out=X)
+    return X
+
+
+@quiet
+def unscaleBlock(X, med, rng, mea, std, pif, nif):
+    """
+    Inverse robout scaling of a float block: logit of the destandardized
+    values rescaled back to the original units, with inf and -inf values
+    replaced by pif and nif. The block is overwritten with the result.
+    """
+    np.multiply(X, std, out=X)
+    np.add(X, mea, out=X)
+    np.divide(1, X, out=X)
+    np.subtract(X, 1, out=X)
+    np.log(X, out=X)
+    np.multiply(X, rng, out=X)
+    np.subtract(med, X, out=X)
+    pos = X == np.inf
+    neg = X == -np.inf
+    np.copyto(X, np.broadcast_to(pif, X.shape), where=pos)
+    np.copyto(X, np.broadcast_to(nif, X.shape), where=neg)
+    return X
+
+
+def updateMoments(moments, Z):
+    """
+    Merges the column counts, means and sums of squared deviations of the
+    float block Z (nan values skipped) into the running moments, using the
+    pairwise update of Chan et al. so that blocks can be streamed.
+
+    Parameters
+    ----------
+    moments : tuple of numpy 1d arrays (count, mean, m2) or None.
+    Z : numpy 2d float array.
+
+    Returns
+    ------
+    tuple of numpy 1d arrays (count, mean, m2).
+    """
+    mask = np.isnan(Z)
+    c = Z.shape[0] - np.count_nonzero(mask, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cm = np.where(mask, 0, Z).sum(axis=0) / c
+        cm2 = np.where(mask, 0, (Z - cm) ** 2).sum(axis=0)
+    cm = np.where(c > 0, cm, 0)
+    cm2 = np.where(c > 0, cm2, 0)
+    if moments is None:
+        return c, cm, cm2
+    count, mean, m2 = moments
+    n = count + c
+    with np.errstate(invalid="ignore", divide="ignore"):
+        delta = cm - mean
+        w = np.where(n > 0, c / n, 0)
+        mean = mean + delta * w
+        m2 = m2 + cm2 + delta ** 2 * count * w
+    return n, mean, m2
+
+
+# bytes of values processed per chunk, small enough to stay in the cache
+# of the core working on it
+CHUNK_BYTES = 1 << 20
+
+
+def chunkRows(ncols, itemsize):
+    """
+    Number of rows per chunk for a block of ncols columns of itemsize bytes.
+    """
+    return max(CHUNK_BYTES // max(ncols * itemsize, 1), 1)
+
+
+def nThreads(n_threads):
+    """
+    Number of threads for n_threads (-1 meaning all cpus).
+    """
+    if n_threads is None:
+        return 1
+    if n_threads < 0:
+        return max((os.cpu_count() or 1) + 1 + n_threads, 1)
+    return max(n_threads, 1)
+
+
+def applyChunked(kernel, src, dst, cols, params, isint=None, n_threads=1,
+                 groups=None):
+    """
+    Applies kernel (scaleBlock or unscaleBlock) with params to the columns
+    cols of src, one cache-sized chunk at a time, writing the result to the
+    same columns of dst (which can be src itself). The whole kernel runs on
+    a chunk before moving to the next one, so the data is read from memory
+    once. Chunks are spread over n_threads threads, numpy releasing the GIL
+    while computing; as every value goes through the same operations the
+    result does not depend on the number of threads.
+
+    A chunk of temporaries is allocated per thread, none when dst is src and
+    all its columns are processed. Columns flagged in isint are truncated
+    to integer values. With groups, params are tables (one row per group)
+    whose rows are gathered for each chunk of rows.
+
+    Parameters
+    ----------
+    kernel : function overwriting a float block with its result.
+    src, dst : numpy 2d arrays with the same number of rows, dst float.
+    cols : numpy 1d int array, positions of the columns to process.
+    params : tuple of numpy 1d arrays aligned with cols.
+    isint : numpy 1d bool array aligned with cols, optional.
+    n_threads : int, number of threads (-1 meaning all cpus).
+    groups : numpy 1d int array, optional, row of params of each row of src.
+
+    Returns
+    ------
+    dst.
+    """
+    params = [np.asarray(p, dtype=dst.dtype) for p in params]
+    if isint is not None and not isint.any():
+        isint = None
+    full = len(cols) == dst.shape[1] and (np.diff(cols) == 1).all()
+    inplace = full and src is dst
+    if inplace and dst.flags.f_contiguous and not dst.flags.c_contiguous:
+        # column-major block: runs of rows (contiguous within a column) of
+        # as many columns as fit in a chunk, so long columns are split too
+        rstep = max(min(dst.shape[0], CHUNK_BYTES // dst.itemsize), 1)
+        cstep = chunkRows(rstep, dst.itemsize)
+        chunks = [(slice(r, r + rstep), slice(c, c + cstep))
+                  for c in range(0, dst.shape[1], cstep)
+                  for r in range(0, dst.shape[0], rstep)]
+    else:
+        step = chunkRows(len(cols), dst.itemsize)
+        chunks = [(slice(r, r + step), slice(None))
+                  for r in range(0, src.shape[0], step)]
+
+    def work(chunk):
+        rows, part = chunk
+        if inplace:
+            blk = dst[rows, part]
+        elif full:
+            blk = np.array(src[rows], dtype=dst.dtype)
+        else:
+            # fancy indexing already returns a new array
+            blk = np.asarray(src[rows][:, cols], dtype=dst.dtype)
+        if groups is None:
+            kernel(blk, *[p[part] for p in params])
+        else:
+            kernel(blk, *[p[:, part][groups[rows]] for p in params])
+        if isint is not None:
+            np.trunc(blk, out=blk, where=isint[part] & np.isfinite(blk))
+        if not inplace:
+            dst[rows, cols] = blk
+
+    n_threads = min(nThreads(n_threads), len(chunks))
+    if n_threads > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(work, chunks))
+    else:
+        for chunk in chunks:
+            work(chunk)
+    return dst
+
+
+def weightedQuantiles(values, weights, qs):
+    """
+    Quantiles qs of each column of a weighted sample (items with zero weight
+    being ignored), as the first item whose cumulative weight reaches q of
+    the column total. Columns with no weight get nan.
+
+    Parameters
+    ----------
+    values, weights : numpy 2d float arrays (items x columns).
+    qs : sequence of floats between 0 and 1.
+
+    Returns
+    ------
+    numpy 2d array (len(qs) x columns).
+    """
+    order = np.argsort(values, axis=0, kind="stable")
+    values = np.take_along_axis(values, order, axis=0)
+    cum = np.cumsum(np.take_along_axis(weights, order, axis=0), axis=0)
+    total = cum[-1]
+    ncols = values.shape[1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # shifting column j by j makes the normalized cumulative weights of
+        # all the columns one increasing sequence, searched at once
+        shift = np.arange(ncols)
+        flat = (np.minimum(cum / total, 1) + shift).ravel(order="F")
+        targets = np.asarray(qs, dtype=np.float64)[:, None] + shift
+    idx = np.searchsorted(flat, targets.ravel(), side="left").reshape(targets.shape)
+    idx = np.clip(idx - shift * values.shape[0], 0, values.shape[0] - 1)
+    res = values[idx, shift]
+    res[:, ~(total > 0)] = np.nan
+    return res
+
+
+def compressSummary(values, weights, size):
+    """
+    Compresses a weighted sample to size equally weighted items per column,
+    taken at evenly spaced quantiles, keeping the total weight of each
+    column. Samples with at most size items are returned unchanged.
+    """
+    if values.shape[0] <= size:
+        return values, weights
+    total = weights.sum(axis=0)
+    values = weightedQuantiles(values, weights, (np.arange(size) + 0.5) / size)
+    weights = np.repeat(total[None, :] / size, size, axis=0)
+    weights[np.isnan(values)] = 0
+    return values, weights
@@ -0,0 +1,105 @@
+"""
+Low-latency transform path of the robout scaler for online inference.
+"""
+import numpy as np
+
+
+class bound_scaler:
+    """
+    Fitted robout parameters bound to a fixed order of scaled columns, so
+    that single records (dict, 1d array) or small 2d arrays are scaled by a
+    handful of numpy calls on the parameter vectors, without building any
+    dataframe nor dispatching per column. The columns are validated once,
+    when binding, and not on each call. Instances are created by the bind
+    method of a fitted robout_scaler.
+
+    Attributes
+    ----------
+    columns : list
+        names of the bound columns, giving the order of the values.
+    """
+
+    def __init__(self, columns, med, rng, mea, std, pif, nif, isint):
+        """
+        Parameters
+        ----------
+        columns : list of the bound column names.
+        med, rng, mea, std, pif, nif : numpy 1d arrays, fitted parameters
+            of the bound columns (rng being upp-low).
+        isint : numpy 1d bool array flagging the int columns.
+        """
+        self.columns = list(columns)
+        self.med = np.array(med, dtype=np.float64)
+        self.rng = np.array(rng, dtype=np.float64)
+        self.mea = np.array(mea, dtype=np.float64)
+        self.std = np.array(std, dtype=np.float64)
+        self.pif = np.array(pif, dtype=np.float64)
+        self.nif = np.array(nif, dtype=np.float64)
+        self.isint = np.array(isint, dtype=bool)
+        self._int = bool(self.isint.any())
+        # (z-0)/1 is the identity, skipped when not standardizing
+        self._std = not ((self.mea == 0).all() and (self.std == 1).all())
+
+    def _values(self, x):
+        if type(x) is dict:
+            return np.array([x[c] for c in self.columns], dtype=np.float64), True
+        x = np.asarray(x, dtype=np.float64)
+        if x.shape[-1] != len(self.columns):
+            raise ValueError("Input must have %d values per row" % len(self.columns))
+        return x, False
+
+    def _result(self, z, isdict):
+        if isdict:
+            return dict(zip(self.columns, z.tolist()))
+        return z
+
+    def transform(self, x):
+        """
+        Scales x, a dict (keyed by the bound columns), a 1d numpy array or
+        a 2d numpy array with the values in the bound column order.
+
+        Returns
+        ------
+        dict or numpy float array (same shape as x) with the scaled values.
+        """
+        x, isdict = self._values(x)
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            # med-x is exactly -(x-med), as computed by the full path
+            z = np.subtract(self.med, x)
+            np.divide(z, self.rng, out=z)
+            np.exp(z, out=z)
+            np.add(z, 1, out=z)
+            np.divide(1, z, out=z)
+            if self._std:
+                np.subtract(z, self.mea, out=z)
+                np.divide(z, self.std, out=z)
+        return self._result(z, isdict)
+
+    def inverse_transform(self, x):
+        """
+        Unscales x, a dict (keyed by the bound columns), a 1d numpy array or
+        a 2d numpy array with the values in the bound column order. inf and
+        -inf are replaced by pif and nif and the int columns truncated as
+        in the full path (the values being kept as floats).
+
+        Returns
+        ------
+        dict or numpy float array (same shape as x) with the unscaled values.
+        """
+        x, isdict = self._values(x)
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            if self._std:
+                z = np.multiply(x, self.std)
+                np.add(z, self.mea, out=z)
+                np.divide(1, z, out=z)
+            else:
+                z = np.divide(1, x)
+            np.subtract(z, 1, out=z)
+            np.log(z, out=z)
+            np.multiply(z, self.rng, out=z)
+            np.subtract(self.med, z, out=z)
+        np.copyto(z, self.pif, where=z == np.inf)
+        np.copyto(z, self.nif, where=z == -np.inf)
+        if self._int:
+            np.trunc(z, out=z, where=self.isint & np.isfinite(z))
+        return self._result(z, isdict)
@@ -0,0 +1,65 @@
+"""
+Binary storage of fitted robout scalers.
+
+A fitted scaler is saved as an uncompressed .npz holding a 2d float array
+with one row per fitted parameter (one column per data column) and a small
+json header with the column names and the scaler parameterization. As the
+members are stored uncompressed, the parameters array can be memory-mapped
+straight from the .npz file.
+"""
+import json
+import struct
+
+import numpy as np
+
+
+def jsonNames(names):
+    """
+    names (column names, ignore entries or groups) as json values, numpy
+    scalars being converted to python ones. Names other than strings,
+    numbers and None cannot be saved and raise a ValueError.
+    """
+    res = []
+    for name in names:
+        if isinstance(name, np.generic):
+            name = name.item()
+        if name is not None and not isinstance(name, (str, int, float)):
+            raise ValueError("Cannot save the name %r of type %s, names must be "
+                             "strings or numbers" % (name, type(name).__name__))
+        res.append(name)
+    return res
+
+
+def saveNpz(path, header, params):
+    """
+    Saves the json serializable header (dict) and the params array to path.
+    """
+    text = np.frombuffer(json.dumps(header).encode("utf8"), dtype=np.uint8)
+    with open(path, "wb") as f:
+        np.savez(f, header=text, params=np.ascontiguousarray(params))
+
+
+def loadNpz(path, mmap=True):
+    """
+    Loads the header (dict) and the params array saved by saveNpz. With mmap
+    the params array is a read-only memory map of the .npz member.
+    """
+    import zipfile
+    with zipfile.ZipFile(path) as zf:
+        header = json.loads(np.load(zf.open("header.npy")).tobytes().decode("utf8"))
+        info = zf.getinfo("params.npy")
+        if not mmap or info.compress_type != zipfile.ZIP_STORED:
+            return header, np.load(zf.open("params.npy"))
+    with open(path, "rb") as f:
+        # skip the local file header of the member to reach the .npy bytes
+        f.seek(info.header_offset)
+        local = f.read(30)
+        nlen, xlen = struct.unpack("<HH", local[26:30])
+        f.seek(info.header_offset + 30 + nlen + xlen)
+        if np.lib.format.read_magic(f) == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return header, np.memmap(path, dtype=dtype, mode="r", shape=shape,
+                             order="F" if fortran else "C", offset=offset)
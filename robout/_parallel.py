@@ -0,0 +1,73 @@
+"""
+Process pool fit of the robout scaler for very wide data.
+
+The float block is written once to a memory-mapped .npy file (in /dev/shm
+when available) and each worker process maps it read-only and fits its own
+contiguous range of columns, so the data is never pickled.
+"""
+import os
+
+import numpy as np
+
+from robout import _engine
+
+
+def nJobs(n_jobs, ncols):
+    """
+    Number of worker processes for n_jobs (-1 meaning all cpus) and ncols
+    columns to fit.
+    """
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        n_jobs = max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return max(min(n_jobs, ncols), 1)
+
+
+def _fitColumns(args):
+    """
+    Worker: fits the columns start:stop of the memory-mapped block at path.
+    """
+    path, start, stop, uppq, lowq = args
+    X = np.load(path, mmap_mode="r")[:, start:stop]
+    return _engine.fitStats(X, uppq, lowq) + (_engine.intFlags(X),)
+
+
+def fitStatsParallel(X, uppq, lowq, n_jobs):
+    """
+    Same as _engine.fitStats followed by _engine.intFlags, but spreading
+    contiguous ranges of columns over a pool of n_jobs processes. Each
+    column is fitted by the same code as in the serial path, so the result
+    is identical to it.
+
+    Parameters
+    ----------
+    X : numpy 2d float array, shared with the workers in its float type.
+    uppq, lowq : floats between 0 and 1.
+    n_jobs : int, number of worker processes.
+
+    Returns
+    ------
+    tuple of numpy 1d arrays (med, upp, low, pif, nif, isint).
+    """
+    # imported here, the process pool being rarely used
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    bounds = [(c[0], c[-1] + 1) for c in
+              np.array_split(np.arange(X.shape[1]), n_jobs) if len(c)]
+    tmp = tempfile.mkdtemp(dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    try:
+        path = os.path.join(tmp, "block.npy")
+        block = np.lib.format.open_memmap(path, mode="w+", dtype=X.dtype,
+                                          shape=X.shape, fortran_order=True)
+        block[...] = X
+        block.flush()
+        del block
+        with ProcessPoolExecutor(len(bounds)) as pool:
+            parts = list(pool.map(_fitColumns, [(path, a, b, uppq, lowq)
+                                                for a, b in bounds]))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return tuple(np.concatenate(v) for v in zip(*parts))
@@ -0,0 +1,190 @@
+"""
+Content-addressed cache of fitted robout parameters.
+
+A scaler given a fit_cache fingerprints its input (sha256 of the numeric
+buffers with their dtypes and shapes, the column names, the string and
+ignored flags and the parameters the fit depends on) and, when the same
+fingerprint was fitted before, takes the fitted parameters from the cache
+instead of fitting them again. A fit on unchanged data then costs the time
+needed to hash it.
+
+    from robout.cache import fit_cache
+
+    cache = fit_cache("/var/cache/robout", max_bytes=1 << 28)
+    rs = rbt.robout_scaler(cache=cache)
+
+Entries are kept in an in-memory LRU and, optionally, as .npz files in a
+directory shared by several processes: files are written to a temporary
+name and atomically renamed, readers treat missing or unreadable files as
+misses, and the least recently used files are deleted when the directory
+grows beyond max_bytes.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from robout import _io
+
+# version of the fingerprint, to be changed with the fit results
+VERSION = 1
+
+
+def fingerprint(header, arrays):
+    """
+    Hex sha256 digest of the json serializable header and of the bytes,
+    dtype and shape of each numpy array.
+    """
+    h = hashlib.sha256(json.dumps([VERSION, header], sort_keys=True,
+                                  default=str).encode("utf8"))
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(("%s%s" % (a.dtype.str, a.shape)).encode("utf8"))
+        h.update(memoryview(a.reshape(-1)).cast("B"))
+    return h.hexdigest()
+
+
+class fit_cache:
+    """
+    Cache of fitted robout parameters keyed by fingerprint, in memory and
+    optionally on disk. It can be shared by scalers and threads, and its
+    directory by processes.
+
+    Attributes
+    ----------
+    directory : str or None
+        directory of the on-disk entries, None for a memory only cache.
+
+    max_entries : int
+        number of entries kept in memory.
+
+    max_bytes : int
+        size of the on-disk entries beyond which the least recently used
+        are deleted.
+    """
+
+    def __init__(self, directory=None, max_entries=128, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __getstate__(self):
+        # the lock is not picklable: a copy (pickle, deepcopy, sklearn clone)
+        # gets a new one along with a snapshot of the in-memory entries
+        with self._lock:
+            state = self.__dict__.copy()
+            state["_memory"] = OrderedDict(self._memory)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """
+        Fitted parameters (tuple of numpy 1d arrays, in the order of
+        robout_scaler.PARAMS) stored under key, or None.
+        """
+        with self._lock:
+            fitted = self._memory.get(key)
+            if fitted is not None:
+                self._memory.move_to_end(key)
+                return tuple(v.copy() for v in fitted)
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            header, params = _io.loadNpz(path, mmap=False)
+            if header.get("key") != key:
+                return None
+            # the access time drives the eviction of the files
+            os.utime(path)
+        except Exception:
+            # missing (never stored or evicted by another process) or unreadable
+            return None
+        fitted = tuple(v.astype(bool) if i >= 7 else v for i, v in enumerate(params))
+        self._remember(key, fitted)
+        return tuple(v.copy() for v in fitted)
+
+    def put(self, key, fitted):
+        """
+        Stores the fitted parameters (tuple of numpy 1d arrays) under key.
+        """
+        fitted = tuple(np.array(v) for v in fitted)
+        self._remember(key, fitted)
+        if self.directory is None:
+            return
+        import tempfile
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        try:
+            _io.saveNpz(tmp, {"version": VERSION, "key": key},
+                        np.vstack([v.astype(np.float64) for v in fitted]))
+            # readers see either no file or the complete one
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._evict(key)
+
+    def _remember(self, key, fitted):
+        with self._lock:
+            self._memory[key] = fitted
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, keep):
+        """
+        Deletes the least recently used files (but keep) while the directory
+        holds more than max_bytes of entries.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(e[1] for e in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep + ".npz":
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # already deleted by another process
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Removes all the entries, in memory and on disk.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
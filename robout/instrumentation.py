@@ -0,0 +1,141 @@
+"""
+Opt-in per-stage instrumentation of the robout scaler.
+
+The fit, transform and inverse_transform paths are split in named stages
+(e.g. "fit.stats" for the median, quantiles and tail medians). When hooks
+are registered, each stage reports a record (a dict) with its name, wall
+time in seconds, number of rows and columns processed and, if requested,
+the peak bytes allocated during the stage (traced with tracemalloc; 
+before python 3.9, which cannot reset the traced peak, a stage staying 
+below the peak of an earlier one reports its net allocation instead). 
+With no hook registered a stage costs a single function call.
+
+    from robout import instrumentation
+
+    with instrumentation.profile() as records:
+        rs.fit_transform(df)
+
+    instrumentation.add_hook(lambda record: metrics.send(record))
+
+Stages: fit.columns (string and ignore check), fit.fingerprint (with a
+cache), fit.block (float block extraction), fit.stats (median, quantiles
+and tail medians), fit.intcheck, fit.sigmoid, fit.standardize, fit.output,
+and for transform and inverse_transform: <method>.block, <method>.kernel
+and <method>.output.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# active hooks (functions called with each record) and those of them
+# asking for memory tracing
+_hooks = []
+_tracing = []
+
+# resets the traced peak (python 3.9+)
+_resetPeak = getattr(tracemalloc, "reset_peak", None)
+
+
+class _stage:
+    """
+    Context manager timing a stage and reporting its record to the hooks.
+    """
+    __slots__ = ("name", "rows", "cols", "start", "traced", "base", "peak")
+
+    def __init__(self, name, rows, cols):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+
+    def __enter__(self):
+        self.traced = bool(_tracing) and tracemalloc.is_tracing()
+        if self.traced:
+            if _resetPeak is not None:
+                _resetPeak()
+            self.base, self.peak = tracemalloc.get_traced_memory()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record = {"stage": self.name, "seconds": time.perf_counter() - self.start,
+                  "rows": self.rows, "cols": self.cols}
+        if self.traced:
+            # a peak not above the one at the start is not the stage's own
+            current, peak = tracemalloc.get_traced_memory()
+            top = peak if peak > self.peak else max(current, self.base)
+            record["peak_bytes"] = top - self.base
+        for hook in list(_hooks):
+            hook(record)
+        return False
+
+
+class _noStage:
+    """
+    Context manager doing nothing, used when no hook is registered.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOSTAGE = _noStage()
+
+
+def stage(name, rows=0, cols=0):
+    """
+    Context manager delimiting the stage name processing rows x cols values.
+    """
+    if not _hooks:
+        return _NOSTAGE
+    return _stage(name, rows, cols)
+
+
+def add_hook(hook, memory=False):
+    """
+    Registers hook, a function called with the record of every stage run
+    afterwards. With memory, peak allocated bytes are traced (tracemalloc
+    is started if needed, slowing down allocations).
+    """
+    _hooks.append(hook)
+    if memory:
+        _tracing.append(hook)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    return hook
+
+
+def remove_hook(hook):
+    """
+    Unregisters a hook added by add_hook.
+    """
+    _hooks.remove(hook)
+    if hook in _tracing:
+        _tracing.remove(hook)
+
+
+@contextmanager
+def profile(callback=None, memory=True):
+    """
+    Context manager collecting the records of the stages run inside it in a
+    list (the value of the with statement), forwarding them to callback if
+    given. tracemalloc is stopped on exit if started by it.
+    """
+    records = []
+
+    def hook(record):
+        records.append(record)
+        if callback is not None:
+            callback(record)
+
+    started = memory and not tracemalloc.is_tracing()
+    add_hook(hook, memory)
+    try:
+        yield records
+    finally:
+        remove_hook(hook)
+        if started and not _tracing:
+            tracemalloc.stop()
@@ -0,0 +1,206 @@
+"""
+File to file robout scaling with memory bounded by the chunk size.
+
+Inputs are .npy files (memory-mapped) or csv files (read in chunks) and
+outputs .npy or csv files, a .npy input going to a .npy output being
+scaled straight into a memory-mapped file. Either way the data goes
+through one chunk of rows at a time, so that files larger than the memory
+can be scaled. The same chunked reader feeds the streaming fit.
+
+Command line usage (robout console script):
+
+    robout fit [--uppq Q] [--lowq Q] [--normalization N] [--ignore A,B]
+               [--eps E] [--chunksize N] input model.npz
+    robout transform [--inverse] [--chunksize N] [--threads N]
+                     model.npz input output
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from robout.robout_scaler import robout_scaler
+
+
+def readChunks(path, chunksize=100000):
+    """
+    Yields the rows of a .npy file (memory-mapped, as array slices) or of a
+    csv file (as pandas dataframes) in chunks of chunksize rows.
+    """
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+        for r in range(0, data.shape[0], chunksize):
+            yield data[r:r + chunksize]
+    else:
+        import pandas as pd
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield chunk
+
+
+class npyWriter:
+    """
+    Writes a 2d .npy file by appending chunks of rows, the number of rows
+    being written to the header when closing.
+    """
+    # bytes reserved for the header, enough for any 2d shape
+    HEADER = 128
+
+    def __init__(self, path, ncols, dtype):
+        self.file = open(path, "wb")
+        self.ncols = ncols
+        self.dtype = np.dtype(dtype)
+        self.nrows = 0
+        self.file.write(b"\0" * self.HEADER)
+
+    def write(self, block):
+        block = np.ascontiguousarray(block, dtype=self.dtype)
+        self.file.write(block.tobytes())
+        self.nrows += block.shape[0]
+
+    def close(self):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d, %d), }" \
+                 % (np.lib.format.dtype_to_descr(self.dtype), self.nrows, self.ncols)
+        header = header.ljust(self.HEADER - 10 - 1) + "\n"
+        self.file.seek(0)
+        self.file.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)))
+        self.file.write(header.encode("latin1"))
+        self.file.close()
+
+
+def fitFile(scaler, path, chunksize=100000):
+    """
+    Fits the scaler on a .npy or csv file with the streaming fit (partial_fit
+    and finalize), reading the file in chunks of rows. When the scaler
+    standardizes (normalization 0) the file is read a second time.
+
+    Returns
+    ------
+    the fitted scaler.
+    """
+    for chunk in readChunks(path, chunksize):
+        scaler.partial_fit(chunk)
+    second = readChunks(path, chunksize) if scaler.normalization == 0 else None
+    return scaler.finalize(second)
+
+
+def transformFile(scaler, src, dst, inverse=False, chunksize=100000, report=None):
+    """
+    Streams the .npy or csv file src through the transform (or with inverse,
+    the inverse_transform) of a fitted scaler into dst, a .npy or csv file.
+    String and ignored columns pass through untouched (csv output only for
+    string columns, a .npy output raising a ValueError). Memory use is bounded by chunksize, not by the size of
+    the file.
+
+    Parameters
+    ----------
+    scaler : fitted robout_scaler instance.
+    src, dst : str, input and output file paths (.npy or .csv).
+    inverse : bool, use inverse_transform instead of transform.
+    chunksize : int, number of rows per chunk.
+    report : function, optional, called with the stats after each chunk.
+
+    Returns
+    ------
+    dict with the number of rows, the elapsed seconds and the rows per second.
+    """
+    apply = scaler.inverse_transform if inverse else scaler.transform
+    start = time.perf_counter()
+    stats = {"rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+
+    def progress(n):
+        stats["rows"] += n
+        stats["seconds"] = time.perf_counter() - start
+        stats["rows_per_sec"] = stats["rows"] / max(stats["seconds"], 1e-9)
+        if report is not None:
+            report(stats)
+
+    if src.endswith(".npy") and dst.endswith(".npy"):
+        data = np.load(src, mmap_mode="r")
+        out = np.lib.format.open_memmap(dst, mode="w+", dtype=scaler.dtype,
+                                        shape=data.shape)
+        for r in range(0, data.shape[0], chunksize):
+            apply(data[r:r + chunksize], out=out[r:r + chunksize])
+            progress(min(chunksize, data.shape[0] - r))
+        out.flush()
+        del out
+        return stats
+
+    writer = None
+    first = True
+    try:
+        for chunk in readChunks(src, chunksize):
+            res = apply(chunk)
+            if dst.endswith(".npy"):
+                if writer is None:
+                    strings = [c for c in res.columns if res[c].dtype.kind not in "biuf"]
+                    if strings:
+                        raise ValueError("String columns %s cannot be written to a .npy "
+                                         "file, use a csv output" % strings)
+                    writer = npyWriter(dst, res.shape[1], scaler.dtype)
+                writer.write(res.to_numpy(dtype=scaler.dtype))
+            else:
+                if isinstance(res, np.ndarray):
+                    import pandas as pd
+                    res = pd.DataFrame(res)
+                res.to_csv(dst, mode="w" if first else "a", header=first, index=False)
+            first = False
+            progress(len(chunk))
+    except Exception:
+        # a .npy output is not left with a header covering part of the rows
+        if writer is not None:
+            writer.close()
+            os.remove(dst)
+        raise
+    if writer is not None:
+        writer.close()
+    return stats
+
+
+def main(argv=None):
+    """
+    Entry point of the robout console script.
+    """
+    parser = argparse.ArgumentParser(prog="robout", description=
+                                     "Robust scaling for numeric data with outliers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit = sub.add_parser("fit", help="fit a scaler on a .npy or csv file")
+    fit.add_argument("input")
+    fit.add_argument("model", help="output .npz file with the fitted scaler")
+    fit.add_argument("--uppq", type=float, default=0.9)
+    fit.add_argument("--lowq", type=float, default=0.1)
+    fit.add_argument("--normalization", type=int, default=0, choices=[0, 1, 2])
+    fit.add_argument("--ignore", default="", help="comma separated column names")
+    fit.add_argument("--eps", type=float, default=0.01)
+    fit.add_argument("--chunksize", type=int, default=100000)
+    tr = sub.add_parser("transform", help="scale a .npy or csv file")
+    tr.add_argument("model", help=".npz file with the fitted scaler")
+    tr.add_argument("input")
+    tr.add_argument("output")
+    tr.add_argument("--inverse", action="store_true", help="apply inverse_transform")
+    tr.add_argument("--chunksize", type=int, default=100000)
+    tr.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "fit":
+        ignore = [c for c in args.ignore.split(",") if c]
+        if args.input.endswith(".npy"):
+            ignore = [int(c) for c in ignore]
+        scaler = robout_scaler(uppq=args.uppq, lowq=args.lowq, eps=args.eps,
+                               normalization=args.normalization, ignore=ignore)
+        fitFile(scaler, args.input, args.chunksize).save(args.model)
+        return 0
+
+    scaler = robout_scaler.load(args.model)
+    scaler.n_threads = args.threads
+    stats = transformFile(scaler, args.input, args.output, inverse=args.inverse,
+                          chunksize=args.chunksize)
+    sys.stderr.write("%d rows in %.2fs (%.0f rows/s)%s" % (
+        stats["rows"], stats["seconds"], stats["rows_per_sec"], os.linesep))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
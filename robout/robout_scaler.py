@@ -1,3 +1,43 @@
+import sys
+
+import numpy as np
+
+from robout import _adapters, _engine, _io, _parallel
+from robout._fastpath import bound_scaler
+from robout._sketch import kll_sketch
+from robout.instrumentation import stage
+
+# parameters of the constructor, as returned by get_params
+PARAMETERS = ["uppq", "lowq", "normalization", "ignore", "eps", "n_jobs",
+              "parallel_threshold", "dtype", "n_threads", "group_by", "unseen",
+              "cache"]
+
+# fitted parameters, one value per column, as stored by save
+PARAMS = ["med", "upp", "low", "pif", "nif", "mea", "std", "isint", "stg"]
+
+# fitted parameters of each group, rows of the group_params table
+GROUP_PARAMS = PARAMS[:7]
+
+
+def fittedParam(i):
+    """
+    Property giving access to the i-th fitted parameter array. The fitted 
+    parameters are kept together in the _fitted tuple, so that update can 
+    swap all of them at once.
+    """
+    def get(self):
+        try:
+            return self._fitted[i]
+        except AttributeError:
+            raise AttributeError(PARAMS[i]) from None
+
+    def set(self, value):
+        fitted = list(getattr(self, "_fitted", [None]*len(PARAMS)))
+        fitted[i] = value
+        self._fitted = tuple(fitted)
+    return property(get, set)
+
+
 class robout_scaler:
     """
     Robout scaler preserves outliers found in the unscaled data. 
@@ -31,6 +71,31 @@ class robout_scaler:
     ignore : list
         list of column names from the input dataframe that shall not be 
         scaled due to whatever reason.
+
+    eps : float
+        normalized rank error of the quantile sketches used by the 
+        streaming fit.
+
+    n_jobs : int
+        number of processes fitting the columns in parallel.
+
+    parallel_threshold : int
+        minimum number of values for the fit to use the process pool.
+
+    dtype : numpy.float32 or numpy.float64
+        float type of the scaled data.
+
+    n_threads : int
+        number of threads running the scaling kernels.
+
+    group_by : column name, optional
+        column whose values define groups of rows fitted separately.
+
+    unseen : "global", "nan" or "error"
+        handling of the groups not seen by the fit.
+
+    cache : robout.cache.fit_cache, optional
+        cache of fitted parameters keyed by a fingerprint of the input.
         
     Methods
     -------
@@ -41,8 +106,24 @@ class robout_scaler:
         respectively, the median of those greater than the uppq percentile 
         and the median of those lower than the lowq percentile.
         
-        Executing the fit_transform also generates the logic of the transform 
-        and inverse_transform methods
+        Executing the fit_transform also stores the fitted parameters used 
+        by the transform and inverse_transform methods.
+    
+    fit(df)
+        Stores the fitted parameters only, without scaling the data.
+
+    fit_many(df, quantiles, normalizations=(0,))
+        Fits a family of scalers over a grid of (uppq, lowq) pairs and 
+        normalization modes from a single sort per column.
+
+    partial_fit(chunk) and finalize(chunks=None)
+        Streaming fit for data that does not fit in memory: partial_fit feeds
+        a chunk of rows to bounded-memory quantile sketches and finalize 
+        computes the fitted parameters from them.
+    
+    update(batch, decay=0.9)
+        Incremental refit for drifting data, merging a batch into a decayed
+        summary of the data and swapping the fitted parameters at once.
     
     transform(data)
         Transformation scaling the data according to the parameterization of
@@ -53,9 +134,34 @@ class robout_scaler:
         When unscaling, inf and -inf values are transformed back to, 
         respectively, the median of those greater than the uppq percentile 
         and the median of those lower than the lowq percentile.
+
+    get_params(), set_params(**params) and get_feature_names_out()
+        scikit-learn estimator interface, so that the scaler can be used in
+        Pipeline and ColumnTransformer.
+
+    bind(columns=None)
+        Returns a bound_scaler applying the fitted parameters to single 
+        records (dict or numpy arrays) with minimal overhead.
+
+    save(path) and load(path)
+        Stores the fitted parameters in a compact .npz file and loads them
+        back (memory-mapped) in a new robout_scaler instance, so that the
+        data does not have to be refitted.
+
+    With a robout.cache.fit_cache (cache parameter), refitting unchanged 
+    data takes the fitted parameters from the cache at the cost of hashing
+    the data.
+
+    The stages of fit_transform, transform and inverse_transform report 
+    their time, size and peak memory to the hooks of robout.instrumentation.
     """
                            
-    def __init__(self, uppq=0.9, lowq=0.1, normalization=0, ignore=[]):
+    med, upp, low, pif, nif, mea, std, isint, stg = \
+        [fittedParam(i) for i in range(len(PARAMS))]
+
+    def __init__(self, uppq=0.9, lowq=0.1, normalization=0, ignore=[], eps=0.01,
+                 n_jobs=1, parallel_threshold=5000000, dtype=np.float64,
+                 n_threads=1, group_by=None, unseen="global", cache=None):
         """
         Parameters
         ----------
@@ -76,13 +182,63 @@ class robout_scaler:
         ignore : list
             list of column names from the input dataframe that shall not be 
             scaled due to whatever reason.
+
+        eps : float
+            normalized rank error of the quantile sketches used by the 
+            streaming fit (partial_fit and finalize), their memory use per 
+            column being about 3.3/eps floats (at most three times that).
+
+        n_jobs : int
+            number of processes fitting the columns in parallel, -1 meaning 
+            all the cpus. Results are identical to those of a single process.
+
+        parallel_threshold : int
+            minimum number of values (rows x scaled columns) for the fit to
+            use the process pool, smaller data being fitted in the current 
+            process to avoid the pool startup cost.
+
+        dtype : numpy.float32 or numpy.float64
+            float type of the scaled data, float32 halving the memory used
+            by the data blocks. The fitted parameters are float64.
+
+        n_threads : int
+            number of threads running the scaling kernels over chunks of the 
+            data, -1 meaning all the cpus. Results are identical to those of 
+            a single thread.
+
+        group_by : column name (position for numpy arrays), optional
+            column whose values (e.g. a device id) define groups of rows 
+            getting their own fitted parameters, all the groups being fitted
+            in a single sort. The column itself is not scaled. The fitted 
+            parameters of each group are stored in the group_params table 
+            (parameter x group x column) indexed by the groups attribute.
+
+        unseen : "global", "nan" or "error"
+            how transform and inverse_transform handle rows of groups not
+            seen by the fit: scaled with the parameters fitted on all the
+            rows, set to nan or raising a ValueError.
+
+        cache : robout.cache.fit_cache, optional
+            cache of fitted parameters: fit and fit_transform fingerprint 
+            the input (numeric buffers, column names and dtypes) together 
+            with the parameters the fit depends on and, when it was fitted 
+            before, take the fitted parameters from the cache instead of 
+            computing them. Not used with group_by.
         """
         self.uppq=uppq
         self.lowq=lowq
         self.normalization=normalization
         self.ignore=ignore
+        self.eps=eps
+        self.n_jobs=n_jobs
+        self.parallel_threshold=parallel_threshold
+        self.dtype=np.dtype(dtype)
+        self.n_threads=n_threads
+        self.group_by=group_by
+        self.unseen=unseen
+        self.cache=cache
         
-    def fit_transform(self, df):
+    def fit_transform(self, df, y=None):
         """
         Robout scaler preserves outliers found in the unscaled data. 
         Such outliers are transformed using a non-linear function to 
@@ -101,190 +257,1075 @@ class robout_scaler:
         respectively, the median of those greater than the uppq percentile 
         and the median of those lower than the lowq percentile.
         
-        Executing the fit_transform also generates the logic of the transform 
-        and inverse_transform methods
+        Executing the fit_transform also stores the fitted parameters, one 
+        value per column in aligned 1d arrays (med, upp, low, pif, nif, mea, 
+        std, isint and stg), used by the transform and inverse_transform 
+        methods.
 
         Parameters
         ----------
-        df : pandas dataframe or numpy 2d array.
+        df : pandas dataframe, numpy 2d array or columnar data
+             (numpy structured array, dict of 1d arrays, pyarrow Table
+             or RecordBatch).
              The unscaled, original input data. It can include string type
              columns or other columns to be excluded from scaling (using ignore 
              parameter). All other columns will be transformed according to the 
              parameterization.
 
+        y : ignored, for compatibility with scikit-learn pipelines.
+
         Returns
         ------
-        scaled pandas dataFrame. 
+        scaled pandas dataFrame (or data of the input container type). 
         
         """
-        import pandas as pd
-        import numpy as np
-        import warnings
-        warnings.filterwarnings("ignore", category=RuntimeWarning)
+        data, src, returnnp, num, X, codes, key = self._fitStats(df)
+        cached = X is None
+        if cached:
+            with stage("fit.block", len(data), len(num)):
+                X = inputBlock(src, num, self.dtype)
+        nrows = len(X)
+        if codes is not None:
+            Z = self._fitGroupMoments(num, X, codes, True)
+            with stage("fit.output", nrows, len(self.columns)):
+                return self._output(data, src, returnnp, num, Z)
 
-        # ensure input df is a pandas dataframe or numpy ndarray
-        returnnp = True
-        if type(df) is np.ndarray:
-            try:
-                df = pd.DataFrame(df)
-            except:
-                raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
-        elif type(df) is pd.DataFrame:
-            returnnp = False
+        # apply normalization to the float block (already to be between -1 
+        # and 1 if normalization is 2)
+        params = self._params(num)[:4]
+        if self.normalization == 0:
+            # standardization comes after the sigmoid (cached mea and std
+            # are applied as if just computed)
+            params = params[:2] + (np.zeros(len(num)), np.ones(len(num)))
+        with stage("fit.sigmoid", nrows, len(num)):
+            Z = _engine.applyChunked(_engine.scaleBlock, X, X, np.arange(len(num)),
+                                     params, n_threads=self.n_threads)
+
+        # Get the descriptive stats of the so far normalized columns
+        # needed for the normalization step that makes mean=0 and std=1.
+        if self.normalization == 0:
+            with stage("fit.standardize", nrows, len(num)):
+                if cached:
+                    mea, std = self.mea[num], self.std[num]
+                else:
+                    mea, std = _engine.meanStd(Z)
+                    self.mea[num] = mea
+                    self.std[num] = std
+                np.subtract(Z, mea, out=Z)
+                np.divide(Z, std, out=Z)
+        if key is not None:
+            self.cache.put(key, self._fitted)
+
+        with stage("fit.output", nrows, len(self.columns)):
+            return self._output(data, src, returnnp, num, Z)
+
+    def _output(self, data, src, returnnp, num, Z, isint=None):
+        """
+        Result of the scaling of data: src (the dataframe or the columns of
+        data) having the columns at positions num replaced by the float block
+        Z, in the container type of data.
+        """
+        if type(src) is tuple:
+            return _adapters.toColumnar(src[0], data, src[1], src[2], num, Z, isint)
+        if type(src) is np.ndarray:
+            # numeric numpy arrays are returned in the dtype of the instance
+            dfn = src.astype(self.dtype)
+            dfn[:, num] = Z
+            return dfn
+        dfn = fromBlock(src, num, Z, isint)
+        if returnnp:
+            return dfn.values
         else:
-            raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
-        
+            return dfn
+
+    def fit(self, df, y=None):
+        """
+        Computes the fitted parameters (med, upp, low, pif, nif, mea, std,
+        isint and stg) used by the transform and inverse_transform methods,
+        without building the scaled data. For normalization 1 and 2 no 
+        scaling pass is run; for normalization 0 the mean and standard 
+        deviation of the sigmoid output are reduced over chunks of columns.
+        The fitted parameters are identical to those of fit_transform (up
+        to rounding for the mea and std of each group with group_by).
+
+        Parameters
+        ----------
+        df : pandas dataframe, numpy 2d array or columnar data
+             (numpy structured array, dict of 1d arrays, pyarrow Table
+             or RecordBatch).
+             The unscaled, original input data, as for fit_transform.
+
+        y : ignored, for compatibility with scikit-learn pipelines.
+
+        Returns
+        ------
+        the robout_scaler instance.
+        """
+        data, src, returnnp, num, X, codes, key = self._fitStats(df)
+        if X is None:
+            return self
+        if codes is not None:
+            if self.normalization == 0:
+                self._fitGroupMoments(num, X, codes, False)
+        elif self.normalization == 0:
+            with stage("fit.standardize", len(X), len(num)):
+                med, rng = self._params(num)[:2]
+                mea, std = _engine.scaledMeanStd(X, med, rng)
+                self.mea[num] = mea
+                self.std[num] = std
+        if key is not None:
+            self.cache.put(key, self._fitted)
+        return self
+
+    @classmethod
+    def fit_many(cls, df, quantiles, normalizations=(0,), **params):
+        """
+        Fits one scaler per configuration of a grid of (uppq, lowq) pairs 
+        and normalization modes, sorting each column once for all of them:
+        the median is shared, the quantiles and tail medians of every pair
+        are read from the same sorted block and, for normalization 0, the 
+        mean and standard deviation of every pair are reduced in a single 
+        pass over chunks of the data. Each scaler is fitted identically to
+        robout_scaler(uppq, lowq, normalization, **params).fit(df), sharing 
+        the column names and flags with the others.
+
+        Parameters
+        ----------
+        df : input data, as for fit.
+
+        quantiles : list of (uppq, lowq) pairs.
+
+        normalizations : list of normalization modes (0, 1 or 2).
+
+        params : other parameters of the scalers (e.g. ignore, dtype), 
+            group_by not being supported.
+
+        Returns
+        ------
+        list of fitted robout_scaler instances, one per pair and 
+        normalization (the normalizations of the first pair first). Their
+        parameters can be stacked for comparison, e.g. 
+        numpy.vstack([rs.upp for rs in scalers]).
+        """
+        if params.get("group_by") is not None:
+            raise ValueError("group_by is not supported by fit_many")
+        if not len(quantiles) or not len(normalizations):
+            raise ValueError("fit_many needs at least one quantile pair and normalization")
+        if any(n not in (0, 1, 2) for n in normalizations):
+            raise ValueError("normalization parameter must be 0, 1 or 2")
+        base = cls(uppq=quantiles[0][0], lowq=quantiles[0][1],
+                   normalization=normalizations[0], **params)
+        src, _, names, strings = readInput(df)
+        nrows = inputRows(src)
+        with stage("fit.columns", nrows, len(names)):
+            num = base._setColumns(names, stringFlags(src) if strings is None else strings)
+        with stage("fit.block", nrows, len(num)):
+            X = inputBlock(src, num, base.dtype)
+        with stage("fit.stats", *X.shape):
+            med, tails = _engine.fitStatsMany(X, quantiles)
+        with stage("fit.intcheck", *X.shape):
+            isint = _engine.intFlags(X)
+        moments = None
+        if 0 in normalizations:
+            with stage("fit.standardize", *X.shape):
+                moments = _engine.scaledMeanStdMany(X, med, [upp - low for upp, low, _, _ in tails])
+
+        scalers = []
+        for i, (uppq, lowq) in enumerate(quantiles):
+            for normalization in normalizations:
+                rs = cls(uppq=uppq, lowq=lowq, normalization=normalization, **params)
+                rs.columns = base.columns
+                rs.n_features_in_ = base.n_features_in_
+                rs.stg = base.stg
+                rs._setStats(num, (med,) + tails[i], isint)
+                if normalization == 0:
+                    rs.mea[num], rs.std[num] = moments[i]
+                scalers.append(rs)
+        return scalers
+
+    def _fitStats(self, df):
+        """
+        Common first steps of fit and fit_transform: checks the input, flags
+        the string and ignored columns and stores the descriptive stats of
+        the others, and those of each group with group_by. Returns the input,
+        its source as given by readInput, whether it was a numpy array, the 
+        positions of the scaled columns, their float block, the group of
+        each row (None without group_by) and the cache key of the input 
+        (None without cache). On a cache hit the fitted parameters are taken
+        from the cache and the float block is None.
+        """
+        if self.normalization not in (0, 1, 2):
+            raise ValueError("normalization parameter must be 0, 1 or 2")
+        if self.unseen not in ("global", "nan", "error"):
+            raise ValueError("unseen parameter must be 'global', 'nan' or 'error'")
+        # a fit ends any stream fed to partial_fit
+        self._sketches = None
+
+        # numeric numpy arrays and columnar inputs are read without pandas,
+        # others are ensured to be a pandas dataframe
+        data = df
+        src, returnnp, names, strings = readInput(data)
+
+        # flag string columns and those to be ignored, all others are
+        # gathered in a single float block (one column per scaled column)
+        nrows = inputRows(src)
+        with stage("fit.columns", nrows, len(names)):
+            num = self._setColumns(names, stringFlags(src) if strings is None else strings)
+
+        # the fit of an input already seen is read from the cache
+        key = None
+        if self.cache is not None and self.group_by is None:
+            from robout.cache import fingerprint
+            with stage("fit.fingerprint", nrows, len(num)):
+                header = {"uppq": self.uppq, "lowq": self.lowq,
+                          "normalization": self.normalization, "dtype": self.dtype.name,
+                          "columns": self.columns.tolist(), "stg": self.stg.tolist()}
+                key = fingerprint(header, inputArrays(src, num))
+            fitted = self.cache.get(key)
+            if fitted is not None:
+                self._fitted = fitted
+                return data, src, returnnp, num, None, None, None
+
+        with stage("fit.block", nrows, len(num)):
+            X = inputBlock(src, num, self.dtype)
+
         # store descriptive stats about each column
-        med = df.median()
-        upp = df.quantile(self.uppq)
-        low = df.quantile(self.lowq)
-        pif = df.apply(lambda v: v[v>upp[v.name]].median() if v.name in upp.index else np.nan)
-        nif = df.apply(lambda v: v[v<low[v.name]].median() if v.name in low.index else np.nan)
-        stg = df.apply(lambda v: v.apply(type).eq(str).any() or v.name in self.ignore)
-
-        # Returns for each column name a lambda function converting type to 
-        # int if all unscaled values are int and replace inf and -inf values 
-        # by the, respectively, 99.9% percentile and 0.1% percentile.
-        def intType(n):
-            if stg[n]:
-                # ignoring strings
-                return lambda v: v 
-            elif np.array_equal(df[n], df[n].astype(int)):
-                return lambda v: \
-                       v.replace(np.inf, pif[n]).replace(-np.inf, nif[n])\
-                        .astype(int)
-            else:
-                return lambda v: \
-                       v.replace(np.inf, pif[n]).replace(-np.inf, nif[n])\
-                        .astype(np.float)
+        self._setStats(num, *self._fitBlock(X))
+        codes = None
+        if self.group_by is not None:
+            codes = self._fitGroups(inputColumn(src, names, self.group_by), num, X)
+        return data, src, returnnp, num, X, codes, key
 
-        # A dictionary (column names as keys) with the lambda function 
-        # returned by the intType function.    
-        convInt = pd.Series(df.columns, index=df.columns).apply(intType)
+    def _fitGroups(self, keys, num, X):
+        """
+        Stores the groups of keys (the group_by column) and the descriptive stats
+        of each of them in the group_params table, whose last row holds the
+        parameters fitted on all the rows (the fallback of unseen groups).
+        Returns the group of each row.
+        """
+        with stage("fit.groups", len(X), len(num)):
+            try:
+                keys, codes = np.unique(groupValues(keys), return_inverse=True)
+            except TypeError:
+                raise ValueError("group_by values must be sortable (of a single type)") from None
+            codes = codes.reshape(-1)
+            stats = _engine.groupStats(X, codes, len(keys), self.uppq, self.lowq)
+            table = np.full((len(GROUP_PARAMS), len(keys) + 1, len(self.columns)), np.nan)
+            for i, p in enumerate(GROUP_PARAMS):
+                table[i, -1] = getattr(self, p)
+                if i < len(stats):
+                    table[i, :-1][:, num] = stats[i]
+                else:
+                    table[i, :-1] = getattr(self, p)
+            self.groups = keys
+            self.group_params = table
+        return codes
 
-        # apply normalization to df
-        dfn = df.apply(lambda v: v if stg[v.name] else \
-                       1/(1+np.exp(-(v.astype(np.float)-med[v.name])/(upp[v.name]-low[v.name]))), 
-                       axis=0)
+    def _fitGroupMoments(self, num, X, codes, standardize):
+        """
+        Scales the float block X in place with the parameters of the group 
+        of each row and, for normalization 0, stores the mean and standard
+        deviation of each group (and of all the rows, for the fallback), 
+        standardizing X if standardize. Returns X.
+        """
+        nrows = X.shape[0]
+        cols = np.arange(len(num))
+        ngroups = len(self.groups)
+        if self.normalization == 0:
+            with stage("fit.standardize", nrows, len(num)):
+                med, rng = self._params(num)[:2]
+                mea, std = _engine.scaledMeanStd(X.copy(order="F"), med, rng)
+                self.mea[num] = mea
+                self.std[num] = std
+        with stage("fit.sigmoid", nrows, len(num)):
+            params = self._groupParams(num, slice(None, ngroups))
+            Z = _engine.applyChunked(_engine.scaleBlock, X, X, cols, params[:4],
+                                     n_threads=self.n_threads, groups=codes)
+        if self.normalization == 0:
+            with stage("fit.standardize", nrows, len(num)):
+                mea, std = _engine.groupMeanStd(Z, codes, ngroups)
+                table = self.group_params
+                table[5, :-1][:, num] = mea
+                table[6, :-1][:, num] = std
+                table[5, -1] = self.mea
+                table[6, -1] = self.std
+                if standardize:
+                    _engine.applyChunked(_engine.standardizeBlock, Z, Z, cols, (mea, std),
+                                         n_threads=self.n_threads, groups=codes)
+        return Z
 
-        # Get the descriptive stats of the so far normalized columns 
-        # needed for the normalization step that makes mean=0 and std=1.
-        
-        if self.normalization == 1:
-            mea = pd.Series(0, index=df.columns)
-            std = pd.Series(1, index=df.columns)
-        else: 
-            if not self.normalization:
-                # apply standardization to df
-                mea = dfn.mean()
-                std = dfn.std()
-            elif self.normalization == 2:
-                mea = pd.Series(0.5, index=df.columns)
-                std = pd.Series(0.5, index=df.columns)
-            else:
-                raise ValueError("normalization parameter must be 0, 1 or 2")
-            dfn = dfn.apply(lambda v: v if stg[v.name] else \
-                            (v-mea[v.name])/std[v.name], 
-                            axis=0)
-
-        # Generating the lambda functions (one for each column) used 
-        # by the generic function that will scale any dataframes.
-        def scalerGen(n):
-            if stg[n]:
-                return lambda v: v
-            else:
-                return lambda v: \
-                       (1/(1+np.exp(-(v.astype(np.float)-med[n])/(upp[n]-low[n])))-mea[n])/std[n]
-
-        # Generating the lambda functions (one for each column) used 
-        # by the generic function that will unscale any scaled dataframes. 
-        def unscalerGen(n):
-            if stg[n]:
-                return lambda v: v
-            else:
-                return lambda v: \
-                       convInt[n](med[n]-(upp[n]-low[n])*np.log(1/(v*std[n]+mea[n])-1))
-
-        # Crete series storing the lambda functions dedicated to each column
-        scalein = pd.Series(df.columns, index=df.columns).apply(scalerGen)
-        scaleout = pd.Series(df.columns, index=df.columns).apply(unscalerGen)
-
-        # Create the functions that will be returned by the scaler as methods to 
-        # transform (scaling/unscaling) any data sharing columns with df.
-        def scale(data):
-            """
-            Transformation scaling the data according to the parameterization of
-            the robout_scaler instance.
-            
-            Parameters
-            ----------
-            data : pandas dataframe or numpy 2d array.
-                 The unscaled, original input data. It can include string type
-                 columns or other columns to be excluded from scaling (using ignore 
-                 parameter). All other columns will be transformed according to the 
-                 parameterization.
-
-            Returns
-            ------
-            scaled pandas dataFrame. 
-
-            """
-            # ensure input df is a pandas dataframe or numpy ndarray
-            returnnp = True
-            if type(data) is np.ndarray:
-                try:
-                    data = pd.DataFrame(data)
-                except:
-                    raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
-            elif type(data) is pd.DataFrame:
-                returnnp = False
-            else:
-                raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
-            data = data.apply(lambda v: scalein[v.name](v))
-            if returnnp:
-                return data.values
+    def _setColumns(self, names, strings):
+        """
+        Stores the column names and flags the columns holding strings (as
+        flagged in strings) or to be ignored. Returns the positions of the 
+        columns to be scaled.
+        """
+        self.columns, self.stg = self._flagColumns(names, strings)
+        self.n_features_in_ = len(self.columns)
+        return np.flatnonzero(~self.stg)
+
+    def _flagColumns(self, names, strings):
+        """
+        Column names array and flags (as stored by _setColumns) of the
+        columns holding strings (as flagged in strings) or to be ignored.
+        """
+        columns = columnArray(names)
+        if self.group_by is not None and self.group_by not in list(columns):
+            raise ValueError("group_by column %s not found" % (self.group_by,))
+        stg = np.array([n in self.ignore or n == self.group_by or strings[i]
+                        for i, n in enumerate(columns)], dtype=bool)
+        return columns, stg
+
+    def _fitBlock(self, X):
+        """
+        Descriptive stats (med, upp, low, pif, nif) and int flags of the
+        columns of the float block X, fitted by a pool of n_jobs processes
+        when X has at least parallel_threshold values.
+        """
+        n_jobs = _parallel.nJobs(self.n_jobs, X.shape[1])
+        if n_jobs > 1 and X.size >= self.parallel_threshold:
+            with stage("fit.stats", *X.shape):
+                *stats, isint = _parallel.fitStatsParallel(X, self.uppq, self.lowq, n_jobs)
+            return stats, isint
+        with stage("fit.stats", *X.shape):
+            stats = _engine.fitStats(X, self.uppq, self.lowq)
+        with stage("fit.intcheck", *X.shape):
+            isint = _engine.intFlags(X)
+        return stats, isint
+
+    def _setStats(self, num, stats, isint):
+        """
+        Stores the descriptive stats (med, upp, low, pif, nif) and int flags
+        of the scaled columns at positions num, aligned with all the columns
+        (nan for string and ignored columns). mea and std are set according
+        to the normalization parameter, 0 and 1 until standardization.
+        """
+        ncols = len(self.columns)
+        self.med, self.upp, self.low, self.pif, self.nif = \
+            [alignParams(v, num, ncols) for v in stats]
+        self.isint = np.zeros(ncols, dtype=bool)
+        self.isint[num] = isint
+        half = self.normalization == 2
+        self.mea = alignParams(np.full(len(num), 0.5 if half else 0.0), num, ncols)
+        self.std = alignParams(np.full(len(num), 0.5 if half else 1.0), num, ncols)
+
+    def partial_fit(self, chunk):
+        """
+        Streaming fit: feeds a chunk of rows (e.g. from pandas.read_csv with
+        chunksize) to one bounded-memory quantile sketch per column. Once all
+        the chunks are fed, finalize must be called to compute the fitted
+        parameters. The first chunk defines the columns and those to be
+        ignored, the following ones must have the same columns. The 
+        sketches are discarded by finalize, fit and fit_transform, so a new 
+        stream starts from scratch.
+
+        Parameters
+        ----------
+        chunk : pandas dataframe or numpy 2d array.
+             A chunk of the unscaled, original input data.
+
+        Returns
+        ------
+        the robout_scaler instance.
+        """
+        if self.group_by is not None:
+            raise ValueError("group_by is not supported by the streaming fit")
+        src, _, names, strings = readInput(chunk)
+        if getattr(self, "_sketches", None) is None:
+            num = self._setColumns(names, stringFlags(src) if strings is None else strings)
+            k = int(np.ceil(3.3/self.eps))
+            self._sketches = [kll_sketch(k) for _ in num]
+            self._isint = np.ones(len(num), dtype=bool)
+        elif list(self.columns) != list(names):
+            raise ValueError("All chunks must have the columns of the first one")
+        X = inputBlock(src, np.flatnonzero(~self.stg))
+        for j, sketch in enumerate(self._sketches):
+            sketch.update(X[:, j])
+        self._isint &= _engine.intFlags(X)
+        return self
+
+    def finalize(self, chunks=None):
+        """
+        Computes the fitted parameters from the sketches fed by partial_fit.
+        The median and the uppq and lowq quantiles are estimated within the
+        rank error eps of the sketches, pif and nif being estimated as the
+        (1+uppq)/2 and lowq/2 quantiles. While a column fits in its sketch
+        (no compaction took place) its stats are exact.
+
+        When normalization is 0, the mean and standard deviation of the
+        sigmoid output are computed on a second pass over chunks, if given, 
+        or else estimated from the items kept by the sketches.
+
+        Parameters
+        ----------
+        chunks : iterable of pandas dataframes or numpy 2d arrays, optional.
+             The same chunks fed to partial_fit (e.g. a new pandas.read_csv 
+             reader), used for the standardization pass.
+
+        Returns
+        ------
+        the robout_scaler instance.
+        """
+        if self.normalization not in (0, 1, 2):
+            raise ValueError("normalization parameter must be 0, 1 or 2")
+        if getattr(self, "_sketches", None) is None:
+            raise ValueError("partial_fit must be called before finalize")
+        num = np.flatnonzero(~self.stg)
+        qs = [0.5, self.uppq, self.lowq, (1+self.uppq)/2, self.lowq/2]
+        stats = np.full((5, len(num)), np.nan)
+        for j, sketch in enumerate(self._sketches):
+            if sketch.exact():
+                stats[:, j] = np.ravel(_engine.fitStats(
+                    sketch.levels[0][:, None], self.uppq, self.lowq))
             else:
-                return data  
-        self.transform = scale
-        
-        def unscale(data):
-            """
-            Inverse transformation to go back to the original units.
-            When unscaling, inf and -inf values are transformed back to, 
-            respectively, the median of those greater than the uppq percentile 
-            and the median of those lower than the lowq percentile.
-        
-            Parameters
-            ----------
-            data : pandas dataframe or numpy 2d array.
-                 Scaled data. It can include string type columns or other columns 
-                 to be excluded from scaling (using ignore parameter). All other 
-                 columns will be transformed according to the parameterization.
-
-            Returns
-            ------
-            pandas dataFrame having the columns transformed back to the original units. 
-
-            """
-            # ensure input df is a pandas dataframe or numpy ndarray
-            returnnp = True
-            if type(data) is np.ndarray:
-                try:
-                    data = pd.DataFrame(data)
-                except:
-                    raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
-            elif type(data) is pd.DataFrame:
-                returnnp = False
+                stats[:, j] = sketch.quantile(qs)
+        self._setStats(num, stats, self._isint)
+
+        if self.normalization == 0:
+            med, rng, mea, std = self._params(num)[:4]
+            if chunks is None:
+                for j, sketch in enumerate(self._sketches):
+                    v, w = sketch.items()
+                    z = _engine.scaleBlock(v[:, None], med[j:j+1], rng[j:j+1], 0, 1)[:, 0]
+                    # empty (all nan) columns get nan
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        mea[j] = np.sum(w*z)/np.sum(w)
+                        std[j] = np.sqrt(np.sum(w*(z-mea[j])**2)/(np.sum(w)-1))
             else:
-                raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
-            data = data.apply(lambda v: scaleout[v.name](v))
-            if returnnp:
-                return data.values
+                moments = None
+                for chunk in chunks:
+                    Z = _engine.scaleBlock(inputBlock(readInput(chunk)[0], num), med, rng, 0, 1)
+                    moments = _engine.updateMoments(moments, Z)
+                count, mea, m2 = moments
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    std = np.sqrt(m2/(count-1))
+            self.mea[num] = mea
+            self.std[num] = std
+        self._sketches = None
+        return self
+
+    def update(self, batch, decay=0.9):
+        """
+        Incremental refit for drifting data: merges a batch of rows into a
+        decayed summary of the data seen so far, the weight of the previous
+        data being multiplied by decay at each update, and refreshes the 
+        fitted parameters (med, upp, low, pif, nif and, for normalization 0, 
+        mea and std) from it. The summary keeps about 2/eps weighted items
+        per column, so an update takes time proportional to the batch size,
+        not to the history. pif and nif are estimated as the (1+uppq)/2 
+        and lowq/2 quantiles.
+
+        The new parameters replace the previous ones in a single assignment,
+        so concurrent transform and inverse_transform calls use either the
+        previous or the new parameters, never a mix of both. The first 
+        update starts a new summary (and defines the columns).
+
+        Parameters
+        ----------
+        batch : pandas dataframe or numpy 2d array.
+             A batch of the unscaled, original input data.
+
+        decay : float
+             between 0 and 1, weight kept by the previous data at each 
+             update (1 meaning no forgetting).
+
+        Returns
+        ------
+        the robout_scaler instance.
+        """
+        if self.normalization not in (0, 1, 2):
+            raise ValueError("normalization parameter must be 0, 1 or 2")
+        if self.group_by is not None:
+            raise ValueError("group_by is not supported by update")
+        src, _, names, strings = readInput(batch)
+        summary = getattr(self, "_summary", None)
+        if summary is None:
+            # the columns of a fitted instance are replaced with its parameters
+            columns, stg = self._flagColumns(
+                names, stringFlags(src) if strings is None else strings)
+            num = np.flatnonzero(~stg)
+            isint = np.ones(len(num), dtype=bool)
+        elif list(self.columns) != list(names):
+            raise ValueError("All batches must have the columns of the first one")
+        else:
+            columns, stg = self.columns, self.stg
+            num = np.flatnonzero(~stg)
+            isint = self.isint[num]
+        X = inputBlock(src, num)
+        isint = isint & _engine.intFlags(X)
+        values, weights = X, (~np.isnan(X)).astype(np.float64)
+        if summary is not None:
+            values = np.vstack((summary[0], values))
+            weights = np.vstack((summary[1] * decay, weights))
+        values, weights = _engine.compressSummary(values, weights,
+                                                  int(np.ceil(2/self.eps)))
+        self._summary = (values, weights)
+
+        # new parameters built aside and swapped at once
+        ncols = len(columns)
+        qs = [0.5, self.uppq, self.lowq, (1+self.uppq)/2, self.lowq/2]
+        med, upp, low, pif, nif = [alignParams(v, num, ncols) for v in
+                                   _engine.weightedQuantiles(values, weights, qs)]
+        half = self.normalization == 2
+        mea = alignParams(np.full(len(num), 0.5 if half else 0.0), num, ncols)
+        std = alignParams(np.full(len(num), 0.5 if half else 1.0), num, ncols)
+        if self.normalization == 0:
+            z = _engine.scaleBlock(values.copy(), med[num], upp[num] - low[num], 0, 1)
+            z[weights == 0] = 0
+            total = weights.sum(axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                m = (weights*z).sum(axis=0)/total
+                mea[num] = m
+                std[num] = np.sqrt((weights*(z - m)**2).sum(axis=0)/(total - 1))
+        full = np.zeros(ncols, dtype=bool)
+        full[num] = isint
+        self._fitted = (med, upp, low, pif, nif, mea, std, full, stg)
+        self.columns = columns
+        self.n_features_in_ = ncols
+        return self
+
+    def bind(self, columns=None):
+        """
+        Binds the fitted parameters to a fixed order of scaled columns and
+        returns a bound_scaler, whose transform and inverse_transform take
+        a dict, a 1d numpy array or a small 2d numpy array (values in the 
+        bound column order) with no dataframe construction nor per column
+        dispatch. Meant for low-latency scoring of single records.
+
+        Parameters
+        ----------
+        columns : list, optional.
+            names of the columns to bind, all the scaled columns (not string 
+            nor ignored) by default.
+
+        Returns
+        ------
+        bound_scaler instance.
+        """
+        if not hasattr(self, "columns"):
+            raise ValueError("robout_scaler instance is not fitted, call fit or fit_transform first")
+        if self.group_by is not None:
+            raise ValueError("group_by scalers cannot be bound")
+        if columns is None:
+            columns = list(self.columns[~self.stg])
+        pos = self._indexer(columns)
+        if (pos < 0).any():
+            raise ValueError("Unknown columns: %s" % [c for c, p in zip(columns, pos) if p < 0])
+        if self.stg[pos].any():
+            raise ValueError("String and ignored columns cannot be bound")
+        return bound_scaler(columns, *self._params(pos))
+
+    def save(self, path):
+        """
+        Saves the fitted parameters to path, as an uncompressed .npz file
+        holding one row per parameter (med, upp, low, pif, nif, mea, std, 
+        isint and stg) and a small header with the column names and the
+        parameterization of the instance. With group_by, the group_params 
+        table follows (one row per parameter and group) and the header 
+        holds the groups. The state of the streaming fit is not saved.
+        Column names, ignore entries and groups must be strings or numbers
+        (numpy scalars included), others raise a ValueError.
+
+        Parameters
+        ----------
+        path : str, file path (usually with .npz extension).
+        """
+        if not hasattr(self, "columns"):
+            raise ValueError("robout_scaler instance is not fitted, call fit or fit_transform first")
+        header = {"version": 1, "uppq": float(self.uppq), "lowq": float(self.lowq),
+                  "normalization": int(self.normalization),
+                  "ignore": _io.jsonNames(self.ignore), "eps": float(self.eps),
+                  "dtype": self.dtype.name, "columns": _io.jsonNames(self.columns),
+                  "group_by": _io.jsonNames([self.group_by])[0],
+                  "unseen": self.unseen}
+        params = [getattr(self, p) for p in PARAMS]
+        if self.group_by is not None:
+            header["groups"] = _io.jsonNames(self.groups)
+            params.append(self.group_params.reshape(-1, len(self.columns)))
+        _io.saveNpz(path, header, np.vstack(params))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a robout_scaler instance saved by the save method, ready to
+        transform and inverse_transform data identically to the saved one.
+
+        Parameters
+        ----------
+        path : str, file path.
+
+        mmap : bool
+            memory-map the parameters from the file instead of reading them.
+
+        Returns
+        ------
+        fitted robout_scaler instance.
+        """
+        header, params = _io.loadNpz(path, mmap=mmap)
+        rs = cls(uppq=header["uppq"], lowq=header["lowq"],
+                 normalization=header["normalization"], ignore=header["ignore"],
+                 eps=header["eps"], dtype=header["dtype"],
+                 group_by=header.get("group_by"), unseen=header.get("unseen", "global"))
+        rs.columns = columnArray(header["columns"])
+        rs.n_features_in_ = len(rs.columns)
+        for p, v in zip(PARAMS, params):
+            setattr(rs, p, v.astype(bool) if p in ("isint", "stg") else v)
+        if rs.group_by is not None:
+            rs.groups = groupValues(header["groups"])
+            rs.group_params = params[len(PARAMS):].reshape(len(GROUP_PARAMS), -1,
+                                                           len(rs.columns))
+        return rs
+
+    def _params(self, pos):
+        """
+        Fitted parameters (med, upp-low, mea, std, pif, nif, isint) of the
+        columns at positions pos, as 1d arrays ready to broadcast over a
+        block. They are all taken from the same snapshot of the fitted
+        parameters, even if update swaps them concurrently.
+        """
+        med, upp, low, pif, nif, mea, std, isint, stg = self._fitted
+        return (med[pos], upp[pos] - low[pos], mea[pos], std[pos],
+                pif[pos], nif[pos], isint[pos])
+
+    def _groupParams(self, pos, rows):
+        """
+        Fitted parameters (med, upp-low, mea, std, pif, nif) of the columns 
+        at positions pos for the rows of the group_params table selected by
+        rows (the last row being the fallback of unseen groups), as 2d 
+        tables (rows x columns).
+        """
+        med, upp, low, pif, nif, mea, std = self.group_params[:, rows][:, :, pos]
+        return med, upp - low, mea, std, pif, nif
+
+    def _groupCodes(self, keys):
+        """
+        Row of the group_params table of each value of the group_by column,
+        -1 (the fallback row) for unseen groups.
+        """
+        keys = groupValues(keys)
+        groups = self.groups
+        if len(groups) == 0:
+            return np.full(len(keys), -1)
+        try:
+            idx = np.minimum(np.searchsorted(groups, keys), len(groups) - 1)
+            found = groups[idx] == keys
+        except TypeError:
+            raise ValueError("group_by values do not match the type of the fitted groups") from None
+        if keys.dtype.kind == "f":
+            # nan keys form a group of their own
+            found |= np.isnan(keys) & np.isnan(groups[idx])
+        codes = np.where(found, idx, -1)
+        if self.unseen == "error" and (codes < 0).any():
+            raise ValueError("Unseen groups: %s" % list(np.unique(np.asarray(keys)[codes < 0])))
+        return codes
+
+    def _positions(self, columns):
+        """
+        Positions in the fitted columns of the given columns and the
+        positions (in columns) of those to be scaled.
+        """
+        if not hasattr(self, "columns"):
+            raise ValueError("robout_scaler instance is not fitted, call fit or fit_transform first")
+        pos = self._indexer(columns)
+        if (pos < 0).any():
+            raise ValueError("Unknown columns: %s" % [c for c, p in zip(columns, pos) if p < 0])
+        return pos, np.flatnonzero(~self.stg[pos])
+
+    def _indexer(self, names):
+        """
+        Positions of names in the fitted columns, -1 for unknown names. The
+        lookup table is built once per set of fitted columns.
+        """
+        lookup = getattr(self, "_lookup", None)
+        if lookup is None or lookup[0] is not self.columns:
+            lookup = (self.columns, {c: i for i, c in enumerate(self.columns)})
+            self._lookup = lookup
+        return np.array([lookup[1].get(c, -1) for c in names], dtype=np.intp)
+
+    def _apply(self, data, kernel, inverse, copy, out):
+        """
+        Applies kernel (scaleBlock or unscaleBlock) with the fitted
+        parameters to the columns of data to be scaled, chunk by chunk.
+        Numeric numpy arrays are processed without any dataframe, in place
+        when copy is False or into out when given, and columnar inputs
+        (structured arrays, dicts of arrays, pyarrow tables) are read column
+        by column into the float block.
+        """
+        name = "inverse_transform" if inverse else "transform"
+        if isinstance(data, np.ndarray) and data.ndim == 2 and data.dtype.kind in "biuf":
+            pos, num = self._positions(range(data.shape[1]))
+            params = self._params(pos[num])
+            isint = params[6] if inverse else None
+            params = params[:6 if inverse else 4]
+            groups = None
+            if self.group_by is not None:
+                codes = self._groupCodes(data[:, self.group_by])
+                rows, groups = np.unique(codes, return_inverse=True)
+                params = self._groupParams(pos[num], rows)[:len(params)]
+            if out is not None:
+                if out.shape != data.shape or out.dtype.kind != "f":
+                    raise ValueError("out must be a float array shaped like the input")
+                if out is not data:
+                    others = np.setdiff1d(np.arange(data.shape[1]), num)
+                    out[:, others] = data[:, others]
+            elif not copy and data.dtype == self.dtype and data.flags.writeable:
+                out = data
             else:
-                return data
-        self.inverse_transform = unscale
+                out = data.astype(self.dtype, order="K", copy=True)
+                data = out
+            with stage(name + ".kernel", data.shape[0], len(num)):
+                _engine.applyChunked(kernel, data, out, num, params, isint,
+                                     self.n_threads, groups)
+            if groups is not None and self.unseen == "nan":
+                out[np.ix_(codes < 0, num)] = np.nan
+            return out
+        if out is not None:
+            raise ValueError("out is only supported for numeric 2d numpy arrays")
 
-        if returnnp:
-            return dfn.values
+        # columnar inputs are read column by column, others are ensured to 
+        # be a pandas dataframe
+        src, returnnp, names, _ = readInput(data)
+        nrows = inputRows(src)
+        pos, num = self._positions(names)
+        params = self._params(pos[num])
+        isint = params[6] if inverse else None
+        groups = None
+        if self.group_by is not None:
+            codes = self._groupCodes(inputColumn(src, names, self.group_by))
+            rows, groups = np.unique(codes, return_inverse=True)
+            params = self._groupParams(pos[num], rows)
+        with stage(name + ".block", nrows, len(num)):
+            Z = inputBlock(src, num, self.dtype)
+        with stage(name + ".kernel", nrows, len(num)):
+            Z = _engine.applyChunked(kernel, Z, Z, np.arange(len(num)),
+                                     params[:6 if inverse else 4], n_threads=self.n_threads,
+                                     groups=groups)
+        if groups is not None and self.unseen == "nan":
+            Z[codes < 0] = np.nan
+        with stage(name + ".output", nrows, len(names)):
+            return self._output(data, src, returnnp, num, Z, isint)
+
+    def transform(self, data, copy=True, out=None):
+        """
+        Transformation scaling the data according to the parameterization of
+        the robout_scaler instance.
+
+        The scaling runs over cache-sized chunks, so that for numeric numpy 
+        arrays the peak memory of a call is the output array (none with 
+        copy=False or out) plus one chunk of temporaries per thread: at most
+        1.3MB, and with group_by another 1MB for each parameter gathered per
+        row of the chunk (4MB for transform, 6MB for inverse_transform) on
+        top of the group of each row of the data.
+        Dataframes are first copied to a float block of the scaled columns, 
+        which becomes the output. Columnar data is read without pandas, its
+        numeric columns being numpy views of the container memory, and the
+        scaled columns of dicts and pyarrow outputs are views of the block.
+
+        Parameters
+        ----------
+        data : pandas dataframe, numpy 2d array or columnar data
+               (numpy structured array, dict of 1d arrays, pyarrow Table
+               or RecordBatch).
+             The unscaled, original input data. It can include string type
+             columns or other columns to be excluded from scaling (using ignore
+             parameter). All other columns will be transformed according to the
+             parameterization.
+
+        copy : bool
+             if False, a writeable numeric numpy array of the dtype of the 
+             instance is scaled in place and returned. Other inputs 
+             (dataframes, columnar data, arrays of another dtype) are 
+             copied whatever copy.
+
+        out : numpy 2d float array, optional.
+             array shaped like the (numeric numpy) input receiving the result.
+
+        Returns
+        ------
+        scaled pandas dataFrame (or data of the input container type).
+
+        """
+        return self._apply(data, _engine.scaleBlock, False, copy, out)
+
+    def inverse_transform(self, data, copy=True, out=None):
+        """
+        Inverse transformation to go back to the original units.
+        When unscaling, inf and -inf values are transformed back to,
+        respectively, the median of those greater than the uppq percentile
+        and the median of those lower than the lowq percentile.
+
+        The peak memory of a call is the same as for transform. For numeric
+        numpy arrays the int columns are truncated but kept as floats.
+
+        Parameters
+        ----------
+        data : pandas dataframe, numpy 2d array or columnar data
+               (numpy structured array, dict of 1d arrays, pyarrow Table
+               or RecordBatch).
+             Scaled data. It can include string type columns or other columns
+             to be excluded from scaling (using ignore parameter). All other
+             columns will be transformed according to the parameterization.
+
+        copy : bool
+             if False, a writeable numeric numpy array of the dtype of the 
+             instance is unscaled in place and returned. Other inputs are 
+             copied whatever copy, as for transform.
+
+        out : numpy 2d float array, optional.
+             array shaped like the (numeric numpy) input receiving the result.
+
+        Returns
+        ------
+        pandas dataFrame (or data of the input container type) having the 
+        columns transformed back to the original units.
+
+        """
+        return self._apply(data, _engine.unscaleBlock, True, copy, out)
+
+    def get_params(self, deep=True):
+        """
+        Parameters of the instance (those of the constructor), as expected
+        by scikit-learn.
+
+        Returns
+        ------
+        dict of parameter names and values.
+        """
+        return {p: getattr(self, p) for p in PARAMETERS}
+
+    def set_params(self, **params):
+        """
+        Sets parameters of the instance (those of the constructor), as 
+        expected by scikit-learn.
+
+        Returns
+        ------
+        the robout_scaler instance.
+        """
+        for p, v in params.items():
+            if p not in PARAMETERS:
+                raise ValueError("Invalid parameter %s for robout_scaler" % p)
+            setattr(self, p, np.dtype(v) if p == "dtype" else v)
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        """
+        Names of the output columns, as expected by scikit-learn: all the
+        input columns (string and ignored ones being passed through), named
+        x0, x1... when fitted on a numpy array (int column names).
+
+        Parameters
+        ----------
+        input_features : list, optional.
+            names of the input columns, checked against the fitted ones.
+
+        Returns
+        ------
+        numpy 1d object array of column names.
+        """
+        if not hasattr(self, "columns"):
+            raise ValueError("robout_scaler instance is not fitted, call fit or fit_transform first")
+        fromnp = all(type(c) is int for c in self.columns)
+        names = ["x%d" % c if fromnp else str(c) for c in self.columns]
+        if input_features is not None:
+            if len(input_features) != len(names) or \
+               (not fromnp and list(map(str, input_features)) != names):
+                raise ValueError("input_features do not match the fitted columns")
+            names = [str(c) for c in input_features]
+        return np.asarray(names, dtype=object)
+
+    def __sklearn_is_fitted__(self):
+        return hasattr(self, "columns")
+
+
+def readInput(data):
+    """
+    Splits the input data in (src, returnnp, names, strings). src is the
+    data itself for numeric numpy 2d arrays, a tuple (kind, names, columns)
+    for columnar inputs (see _adapters.fromColumnar) and a pandas dataframe
+    otherwise, pandas being imported only then. returnnp tells whether the
+    data was a numpy array, names are the column names and strings flags
+    the columns holding values that are not numbers (None for dataframes, 
+    to be computed by stringFlags when needed). Subclasses of numpy arrays
+    (memory-mapped .npy files, matrices) are read as plain arrays.
+    """
+    if isinstance(data, np.ndarray) and not isinstance(data, np.ma.MaskedArray):
+        data = np.asarray(data)
+    if type(data) is np.ndarray and data.ndim == 2 and data.dtype.kind in "biuf":
+        return data, True, list(range(data.shape[1])), [False]*data.shape[1]
+    columnar = _adapters.fromColumnar(data)
+    if columnar is not None:
+        kind, names, columns, strings = columnar
+        return (kind, names, columns), False, names, strings
+    df, returnnp = toFrame(data)
+    return df, returnnp, df.columns, None
+
+
+def inputRows(src):
+    """
+    Number of rows of src (as given by readInput).
+    """
+    if type(src) is tuple:
+        return len(src[2][0]) if len(src[2]) else 0
+    return len(src)
+
+
+def inputBlock(src, num, dtype=np.float64):
+    """
+    Copies the columns at positions num of src (as given by readInput) to a
+    new float block in column-major order.
+    """
+    if type(src) is np.ndarray:
+        if len(num) == src.shape[1]:
+            return np.array(src, dtype=dtype, order="F")
+        return _adapters.columnsBlock([src[:, c] for c in num], np.arange(len(num)), dtype)
+    if type(src) is tuple:
+        return _adapters.columnsBlock(src[2], num, dtype)
+    return numericBlock(src, num, dtype)
+
+
+def inputArrays(src, num):
+    """
+    Numpy arrays holding the columns at positions num of src (as given by 
+    readInput), without copying them when possible, for fingerprinting.
+    """
+    if type(src) is np.ndarray:
+        return [src] if len(num) == src.shape[1] else [src[:, c] for c in num]
+    if type(src) is tuple:
+        return [src[2][c] for c in num]
+    arrays = []
+    for c in num:
+        col = src.iloc[:, c]
+        if col.dtype.kind in "biuf" and isinstance(col.dtype, np.dtype):
+            arrays.append(col.to_numpy())
         else:
-            return dfn
\ No newline at end of file
+            arrays.append(col.to_numpy(dtype=np.float64, na_value=np.nan))
+    return arrays
+
+
+def inputColumn(src, names, name):
+    """
+    Values of the column name of src (as given by readInput), as a numpy
+    array.
+    """
+    if type(src) is np.ndarray:
+        return src[:, name]
+    if type(src) is tuple:
+        return _adapters.groupKeys(src[2][list(names).index(name)])
+    return src[name].to_numpy()
+
+
+def columnArray(names):
+    """
+    Numpy object array of column names, numpy scalars being converted to
+    python ones.
+    """
+    res = np.empty(len(names), dtype=object)
+    res[:] = [n.item() if isinstance(n, np.generic) else n for n in names]
+    return res
+
+
+def groupValues(keys):
+    """
+    Numpy array of group keys, strings being kept as python objects.
+    """
+    keys = np.asarray(keys)
+    if keys.dtype.kind in "US":
+        keys = keys.astype(object)
+    return keys
+
+
+def toFrame(data):
+    """
+    Ensures the input is a pandas dataframe or numpy ndarray, wrapping the
+    latter in a dataframe. Returns the dataframe and whether the input was
+    a numpy ndarray.
+    """
+    if isinstance(data, np.ndarray):
+        import pandas as pd
+        try:
+            return pd.DataFrame(data), True
+        except:
+            raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
+    # a dataframe implies pandas is already imported
+    pd = sys.modules.get("pandas")
+    if pd is not None and type(data) is pd.DataFrame:
+        return data, False
+    else:
+        raise ValueError("Input must be a 2d numpy array or a pandas DataFrame")
+
+
+def stringFlags(df):
+    """
+    Flags the columns of df (pandas dataframe) holding values that are not
+    numbers.
+    """
+    import pandas as pd
+    return [not pd.api.types.is_numeric_dtype(df.dtypes.iloc[i]) and isString(df.iloc[:, i])
+            for i in range(df.shape[1])]
+
+
+def isString(v):
+    """
+    True if the column v (pandas series) holds values that are not numbers.
+    """
+    import pandas as pd
+    if pd.api.types.is_bool_dtype(v):
+        return False
+    if pd.api.types.is_numeric_dtype(v):
+        return False
+    return v.apply(type).eq(str).any() or not pd.api.types.is_object_dtype(v)
+
+
+def numericBlock(df, num, dtype=np.float64):
+    """
+    Copies the columns of df at positions num to a new float block in
+    column-major order, so that each column is contiguous in memory.
+    """
+    X = df.iloc[:, num].to_numpy(dtype=dtype, na_value=np.nan, copy=True)
+    if not X.flags.f_contiguous or not X.flags.writeable:
+        X = np.array(X, order="F")
+    return X
+
+
+def fromBlock(df, num, Z, isint=None):
+    """
+    Builds a dataframe like df having the columns at positions num replaced
+    by the columns of the float block Z. Columns flagged in isint (and free
+    of nan values) are cast to int.
+    """
+    import pandas as pd
+    parts = []
+    order = []
+    isint = np.zeros(len(num), dtype=bool) if isint is None else isint.copy()
+    isint &= np.isfinite(Z).all(axis=0)
+    for flag in (False, True):
+        j = np.flatnonzero(isint == flag)
+        if len(j):
+            block = Z if len(j) == Z.shape[1] else Z[:, j]
+            block = block.astype(int) if flag else block
+            parts.append(pd.DataFrame(block, index=df.index, copy=False))
+            order.append(num[j])
+    others = np.setdiff1d(np.arange(df.shape[1]), num)
+    if len(others):
+        parts.append(df.iloc[:, others])
+        order.append(others)
+    if not parts:
+        return df.iloc[:, :0].copy()
+    if len(parts) == 1:
+        res = parts[0]
+    else:
+        res = pd.concat(parts, axis=1, ignore_index=True)
+        res = res.iloc[:, np.argsort(np.concatenate(order), kind="stable")]
+    res.columns = df.columns
+    return res
+
+
+def alignParams(values, num, ncols):
+    """
+    Spreads the values of the scaled columns (at positions num) over an
+    array with one entry per column, nan for the columns not scaled.
+    """
+    res = np.full(ncols, np.nan)
+    res[num] = values
+    return res
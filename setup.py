@@ -4,8 +4,8 @@ with open("README.md", "r") as fh:
     long_description = fh.read()
 
 requirements = [
-    'numpy>=1.14',
-    'pandas>=0.23' ]
+    'numpy>=1.17',
+    'pandas>=1.1' ]
 	
 setuptools.setup(
     name="robout", 
@@ -18,6 +18,8 @@ setuptools.setup(
     url="https://github.com/pedro-r-dias/robout",
     packages=setuptools.find_packages(),
 	install_requires=requirements,
+	extras_require={'arrow': ['pyarrow']},
+	entry_points={'console_scripts': ['robout=robout.pipeline:main']},
 	keywords=['robout','scaling','standardization','normalization','outlier'],
     classifiers=[
         "Programming Language :: Python :: 3",
@@ -100,5 +100,398 @@ def test_invTransformStd_answer():
                                   np.round((df2-df1.mean())/df2.std(),1), 
                                   check_dtype=False, check_exact=False)
 
+def test_fittedParams_answer():
+    """
+    test the fitted parameters, kept as arrays aligned with the columns, 
+    against the pandas descriptive stats of the scaled columns.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=0, ignore=["time"])
+    rs.fit_transform(df)
+    dfs = df.iloc[:,2:]
+    np.testing.assert_array_equal(rs.med[2:], dfs.median().values)
+    np.testing.assert_array_equal(rs.upp[2:], dfs.quantile(0.9).values)
+    np.testing.assert_array_equal(rs.low[2:], dfs.quantile(0.1).values)
+    np.testing.assert_array_equal(rs.pif[2:], 
+                                  dfs.apply(lambda v: v[v>v.quantile(0.9)].median()).values)
+    np.testing.assert_array_equal(rs.nif[2:], 
+                                  dfs.apply(lambda v: v[v<v.quantile(0.1)].median()).values)
+    assert rs.stg[:2].all() and not rs.stg[2:].any()
+
+def test_partialFit_answer():
+    """
+    test the streaming fit (partial_fit over chunks and finalize) against 
+    the fit_transform output.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=1, ignore=["time"])
+    df1 = rs.fit_transform(df).iloc[:,2:]
+    rs = rbt.robout_scaler(normalization=1, ignore=["time"], eps=0.01)
+    for i in range(0, len(df), 100):
+        rs.partial_fit(df.iloc[i:i+100])
+    df2 = rs.finalize().transform(df).iloc[:,2:]
+    pd.testing.assert_frame_equal(df1, df2, check_exact=False, atol=0.05)
+    # a new stream (after finalize or fit) does not merge into the old one,
+    # and an all nan column gets nan stats
+    x = df.iloc[:,2:].to_numpy(dtype=float)
+    x[:,0] = np.nan
+    rss = [rbt.robout_scaler(normalization=1, eps=0.01) for _ in range(3)]
+    for i in range(0, len(x), 100):
+        rss[0].partial_fit(x[i:i+100])
+    rss[0].finalize()
+    rss[1].partial_fit(x[:100]).fit(x)
+    for rs in rss[::-1]:
+        for i in range(0, len(x), 100):
+            rs.partial_fit(-x[i:i+100])
+        rs.finalize()
+        for p in ["med", "upp", "low", "pif", "nif"]:
+            np.testing.assert_array_equal(getattr(rs, p), getattr(rss[2], p))
+    assert np.isnan(rs.med[0]) and not np.isnan(rs.med[1:]).any()
+
+def test_parallelFit_answer():
+    """
+    test that the fit spread over a process pool (n_jobs) gives the same 
+    result as the serial one.
+    """
+    import robout as rbt
+    rs1 = rbt.robout_scaler(normalization=0, ignore=["time"])
+    rs2 = rbt.robout_scaler(normalization=0, ignore=["time"], n_jobs=3, 
+                            parallel_threshold=0)
+    pd.testing.assert_frame_equal(rs1.fit_transform(df), rs2.fit_transform(df), 
+                                  check_exact=True)
+    for p in ["med", "upp", "low", "pif", "nif", "isint"]:
+        np.testing.assert_array_equal(getattr(rs1, p), getattr(rs2, p))
+
+def test_saveLoad_answer(tmp_path):
+    """
+    test that a saved and loaded (or pickled) robout_scaler instance 
+    transforms and inverse transforms identically to the original one.
+    """
+    import pickle
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=0, ignore=["time"])
+    dfn = rs.fit_transform(df)
+    rs.save(tmp_path / "rs.npz")
+    for rs2 in [rbt.robout_scaler.load(tmp_path / "rs.npz"), 
+                pickle.loads(pickle.dumps(rs))]:
+        pd.testing.assert_frame_equal(rs.transform(df), rs2.transform(df), 
+                                      check_exact=True)
+        pd.testing.assert_frame_equal(rs.inverse_transform(dfn), 
+                                      rs2.inverse_transform(dfn), check_exact=True)
+    # numpy scalar names are saved as numbers, other names are rejected
+    x = df.iloc[:,2:].to_numpy(dtype=float)
+    rs = rbt.robout_scaler(ignore=[np.int64(0)]).fit(x)
+    rs.save(tmp_path / "rs.npz")
+    np.testing.assert_array_equal(rbt.robout_scaler.load(tmp_path / "rs.npz").transform(x), 
+                                  rs.transform(x))
+    rs.fit(pd.DataFrame(x[:,:2], columns=[pd.Timestamp("2020-01-01"), "a"]))
+    try:
+        rs.save(tmp_path / "ts.npz")
+        assert False, "a Timestamp column name shall not be saved"
+    except ValueError as e:
+        assert "Cannot save" in str(e)
+    assert not (tmp_path / "ts.npz").exists()
+
+def test_bind_answer():
+    """
+    test that the bound fast path scales single records (dict and 1d array) 
+    and 2d arrays identically to the transform and inverse_transform methods.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=0, ignore=["time"])
+    dfn = rs.fit_transform(df)
+    bs = rs.bind()
+    x = df.iloc[:20,2:].to_numpy(dtype=float)
+    np.testing.assert_array_equal(bs.transform(x), dfn.iloc[:20,2:].values)
+    np.testing.assert_array_equal(bs.transform(x[0]), dfn.iloc[0,2:].values.astype(float))
+    rec = bs.transform(dict(zip(bs.columns, x[0])))
+    assert list(rec.values()) == list(dfn.iloc[0,2:].astype(float))
+    np.testing.assert_array_equal(bs.inverse_transform(dfn.iloc[:20,2:].values), 
+                                  rs.inverse_transform(dfn.head(20)).iloc[:,2:].values)
+
+def test_inplaceTransform_answer():
+    """
+    test the in place (copy=False) and out buffer transforms of numpy arrays 
+    and the float32 dtype.
+    """
+    import robout as rbt
+    x = df.iloc[:,1:].to_numpy(dtype=float)
+    rs = rbt.robout_scaler(normalization=0, ignore=[0])
+    xn = rs.fit_transform(x)
+    out = np.empty_like(x)
+    assert rs.transform(x, out=out) is out
+    np.testing.assert_array_equal(out, xn)
+    x2 = x.copy()
+    assert rs.transform(x2, copy=False) is x2
+    np.testing.assert_array_equal(x2, xn)
+    np.testing.assert_array_equal(rs.inverse_transform(x2, copy=False), 
+                                  rs.inverse_transform(xn))
+    rs32 = rbt.robout_scaler(normalization=0, ignore=[0], dtype=np.float32)
+    xn32 = rs32.fit_transform(x)
+    assert xn32.dtype == np.float32
+    np.testing.assert_allclose(xn32[:,1:], xn[:,1:], atol=1e-4)
+
+def test_threadedTransform_answer():
+    """
+    test that the transforms running over several threads give the same 
+    result as the single threaded ones.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=0, ignore=["time"])
+    dfn = rs.fit_transform(df)
+    rs.n_threads = 4
+    pd.testing.assert_frame_equal(rs.transform(df), dfn, check_exact=True)
+    pd.testing.assert_frame_equal(rs.inverse_transform(dfn.head(20)), 
+                                  invTransformStd(df, dfn), check_exact=True)
+    x = np.tile(df.iloc[:,2:].to_numpy(dtype=float), (20, 1))
+    rs = rbt.robout_scaler(normalization=0)
+    xn = rs.fit_transform(x)
+    rs.n_threads = 4
+    np.testing.assert_array_equal(rs.transform(x), xn)
+    # small chunks split the columns of a column-major block into row runs
+    size, rbt._engine.CHUNK_BYTES = rbt._engine.CHUNK_BYTES, 1 << 10
+    try:
+        xf = np.asfortranarray(x)
+        np.testing.assert_array_equal(rs.transform(xf, copy=False), xn)
+    finally:
+        rbt._engine.CHUNK_BYTES = size
+
+def test_pipeline_answer(tmp_path):
+    """
+    test the file to file pipeline (csv and npy) against the in memory 
+    fit and transform.
+    """
+    import robout as rbt
+    from robout import pipeline
+    df.to_csv(tmp_path / "in.csv", index=False)
+    assert pipeline.main(["fit", "--normalization", "1", "--ignore", "time", 
+                          "--eps", "0.0001", "--chunksize", "50", 
+                          str(tmp_path / "in.csv"), str(tmp_path / "rs.npz")]) == 0
+    assert pipeline.main(["transform", "--chunksize", "30", str(tmp_path / "rs.npz"), 
+                          str(tmp_path / "in.csv"), str(tmp_path / "out.csv")]) == 0
+    rs = rbt.robout_scaler(normalization=1, ignore=["time"])
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "out.csv").iloc[:,2:], 
+                                  rs.fit_transform(df).iloc[:,2:], check_exact=False)
+    x = df.iloc[:,2:].to_numpy(dtype=float)
+    np.save(tmp_path / "in.npy", x)
+    rs = rbt.robout_scaler(normalization=0)
+    xn = rs.fit_transform(x)
+    stats = pipeline.transformFile(rs, str(tmp_path / "in.npy"), 
+                                   str(tmp_path / "out.npy"), chunksize=7)
+    assert stats["rows"] == len(x)
+    np.testing.assert_array_equal(np.load(tmp_path / "out.npy"), xn)
+    pipeline.transformFile(rs, str(tmp_path / "out.npy"), str(tmp_path / "rec.npy"), 
+                           inverse=True)
+    np.testing.assert_array_equal(np.load(tmp_path / "rec.npy"), 
+                                  rs.inverse_transform(xn))
+    np.testing.assert_array_equal(
+        rbt.robout_scaler(normalization=0).fit_transform(np.load(tmp_path / "in.npy", 
+                                                                 mmap_mode="r")), xn)
+    assert pipeline.main(["fit", "--normalization", "0", "--eps", "0.0001", 
+                          "--chunksize", "50", str(tmp_path / "in.npy"), 
+                          str(tmp_path / "rs.npz")]) == 0
+    rs2 = rbt.robout_scaler.load(tmp_path / "rs.npz")
+    np.testing.assert_allclose(rs2.transform(x), xn, atol=1e-2)
+    assert pipeline.main(["transform", "--chunksize", "30", str(tmp_path / "rs.npz"), 
+                          str(tmp_path / "in.npy"), str(tmp_path / "out.csv")]) == 0
+    np.testing.assert_allclose(pd.read_csv(tmp_path / "out.csv").to_numpy(), 
+                               rs2.transform(x), atol=1e-12)
+    # string columns (id) cannot go to a .npy output
+    rs = rbt.robout_scaler(ignore=["time"]).fit(df)
+    try:
+        pipeline.transformFile(rs, str(tmp_path / "in.csv"), str(tmp_path / "str.npy"))
+        assert False, "string columns shall not be written to .npy"
+    except ValueError as e:
+        assert "csv output" in str(e)
+    assert not (tmp_path / "str.npy").exists()
+
+def test_update_answer():
+    """
+    test the incremental refit: without decay, updates over batches shall 
+    approximate the fit_transform output, and the fitted parameters shall 
+    be swapped at once.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=1, ignore=["time"])
+    df1 = rs.fit_transform(df).iloc[:,2:]
+    rs = rbt.robout_scaler(normalization=1, ignore=["time"])
+    for i in range(0, len(df), 100):
+        fitted = getattr(rs, "_fitted", None)
+        rs.update(df.iloc[i:i+100], decay=1)
+        assert rs._fitted is not fitted
+    df2 = rs.transform(df).iloc[:,2:]
+    pd.testing.assert_frame_equal(df1, df2, check_exact=False, atol=0.05)
+    # with decay the parameters follow a shift of the data, further than 
+    # without it
+    x = df.iloc[:,2:].to_numpy(dtype=float)
+    rs = rbt.robout_scaler().fit(x)
+    drift = (x + 4*(rs.upp - rs.low))[np.random.default_rng(0).permutation(len(x))]
+    rs0 = rbt.robout_scaler(normalization=1).fit(drift)
+    moved = []
+    for decay in (0.5, 1):
+        rs = rbt.robout_scaler(normalization=1).fit(x)
+        rs.update(x, decay)
+        for i in range(0, len(x), 100):
+            rs.update(drift[i:i+100], decay)
+        moved.append((np.abs(rs.med - rs0.med), np.abs(rs.upp - rs.low - (rs0.upp - rs0.low))))
+    assert (moved[0][0] < moved[1][0]).all() and (moved[0][1] < moved[1][1]).all()
+    # the first update of a fitted instance swaps its parameters at once
+    swaps = []
+    class scaler(rbt.robout_scaler):
+        def __setattr__(self, name, value):
+            if name == "_fitted":
+                swaps.append(value)
+            super().__setattr__(name, value)
+    rs = scaler(normalization=1).fit(x)
+    del swaps[:]
+    rs.update(drift)
+    assert len(swaps) == 1
+
+def test_profile_answer():
+    """
+    test the stage instrumentation: profile shall collect one record per 
+    stage run inside it, and nothing once exited.
+    """
+    import robout as rbt
+    from robout import instrumentation
+    rs = rbt.robout_scaler(ignore=["time"])
+    with instrumentation.profile() as records:
+        dfn = rs.fit_transform(df)
+        rs.inverse_transform(dfn)
+    stages = [r["stage"] for r in records]
+    assert stages[0] == "fit.columns" and "fit.stats" in stages
+    assert "fit.standardize" in stages and "inverse_transform.kernel" in stages
+    for r in records:
+        assert r["seconds"] >= 0 and r["peak_bytes"] >= 0
+        assert r["rows"] == len(df)
+    rs.transform(df)
+    assert stages == [r["stage"] for r in records]
+    cols = {c: df[c].to_numpy() for c in df.columns[1:]}
+    with instrumentation.profile() as records:
+        rs.fit_transform(cols)
+    assert all(r["rows"] == len(df) for r in records)
+
+def test_fit_answer():
+    """
+    test the standalone fit: the fitted parameters shall be those of 
+    fit_transform, and the scikit-learn interface shall be consistent.
+    """
+    import robout as rbt
+    for normalization in (0, 1, 2):
+        rs1 = rbt.robout_scaler(normalization=normalization, ignore=["time"])
+        df1 = rs1.fit_transform(df)
+        rs2 = rbt.robout_scaler(normalization=normalization, ignore=["time"])
+        assert rs2.fit(df) is rs2
+        for p in ["med", "upp", "low", "pif", "nif", "mea", "std"]:
+            np.testing.assert_array_equal(getattr(rs1, p), getattr(rs2, p))
+        pd.testing.assert_frame_equal(df1, rs2.transform(df))
+    params = rs2.get_params()
+    assert params["normalization"] == 2 and params["ignore"] == ["time"]
+    rs3 = rbt.robout_scaler().set_params(**params)
+    assert rs3.get_params() == params
+    assert list(rs2.get_feature_names_out()) == list(df.columns)
+
+def test_groupBy_answer():
+    """
+    test the group-wise fit: each group shall be scaled as if fitted alone,
+    and rows of unseen groups with the parameters fitted on all the rows.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(normalization=1, ignore=["time"], group_by="id")
+    dfn = rs.fit_transform(df)
+    pd.testing.assert_frame_equal(dfn, rs.transform(df))
+    for key, sub in list(df.groupby("id"))[:3]:
+        rs1 = rbt.robout_scaler(normalization=1, ignore=["time", "id"])
+        pd.testing.assert_frame_equal(dfn.loc[sub.index], rs1.fit_transform(sub))
+    new = df.iloc[:10].copy()
+    new["id"] = "unseen"
+    rs2 = rbt.robout_scaler(normalization=1, ignore=["time", "id"]).fit(df)
+    pd.testing.assert_frame_equal(rs.transform(new), rs2.transform(new))
+
+def test_columnar_answer():
+    """
+    test the columnar inputs: dicts of arrays and structured arrays shall be
+    scaled as dataframes and returned in the same container type.
+    """
+    import robout as rbt
+    rs = rbt.robout_scaler(ignore=["time"])
+    dfn = rs.fit_transform(df)
+    data = {c: df[c].to_numpy() for c in df.columns}
+    res = rs.transform(data)
+    assert type(res) is dict and list(res) == list(df.columns)
+    for c in df.columns:
+        np.testing.assert_array_equal(res[c], dfn[c].to_numpy())
+    rec = df.to_records(index=False)
+    res = rbt.robout_scaler(ignore=["time"]).fit_transform(rec)
+    assert type(res) is type(rec) and res.dtype.names == rec.dtype.names
+    for c in df.columns:
+        np.testing.assert_array_equal(res[c], dfn[c].to_numpy())
+    try:
+        rs.transform({c: data[c][0] for c in df.columns})
+        assert False, "a dict of scalars shall be rejected"
+    except ValueError as e:
+        assert "bind()" in str(e)
+
+def test_numpyOnly_answer():
+    """
+    test the numpy only core: importing robout and scaling numpy arrays 
+    shall neither import pandas nor change the warning filters.
+    """
+    import subprocess
+    import sys
+    code = "\n".join([
+        "import sys, warnings",
+        "import numpy as np",
+        "filters = list(warnings.filters)",
+        "import robout as rbt",
+        "x = np.random.default_rng(0).standard_t(1, (500, 4))",
+        "rs = rbt.robout_scaler(normalization=0)",
+        "rs.inverse_transform(rs.fit_transform(x))",
+        "assert 'pandas' not in sys.modules",
+        "assert list(warnings.filters) == filters"])
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+def test_fitMany_answer():
+    """
+    test the multi-configuration fit: each scaler of the family shall be 
+    fitted as a scaler of the same configuration fitted alone.
+    """
+    import robout as rbt
+    quantiles = [(0.9, 0.1), (0.75, 0.25)]
+    scalers = rbt.robout_scaler.fit_many(df, quantiles, (0, 1), ignore=["time"])
+    assert len(scalers) == 4
+    for rs, (uppq, lowq, normalization) in zip(scalers, [(0.9, 0.1, 0), (0.9, 0.1, 1),
+                                                         (0.75, 0.25, 0), (0.75, 0.25, 1)]):
+        assert (rs.uppq, rs.lowq, rs.normalization) == (uppq, lowq, normalization)
+        rs1 = rbt.robout_scaler(uppq=uppq, lowq=lowq, normalization=normalization,
+                                ignore=["time"])
+        pd.testing.assert_frame_equal(rs1.fit_transform(df), rs.transform(df))
+
+def test_cache_answer(tmp_path):
+    """
+    test the fit cache: refitting the same data shall take the fitted 
+    parameters from the cache, in memory or on disk, with the same results.
+    """
+    import copy, pickle
+    import robout as rbt
+    from robout.cache import fit_cache
+    cache = fit_cache(str(tmp_path))
+    rs = rbt.robout_scaler(ignore=["time"], cache=cache)
+    dfn = rs.fit_transform(df)
+    assert len(cache._memory) == 1 and len(list(tmp_path.glob("*.npz"))) == 1
+    for c in (cache, fit_cache(str(tmp_path))):
+        rs1 = rbt.robout_scaler(ignore=["time"], cache=c)
+        pd.testing.assert_frame_equal(rs1.fit_transform(df), dfn)
+        for p in ["med", "upp", "low", "pif", "nif", "mea", "std", "isint"]:
+            np.testing.assert_array_equal(getattr(rs1.fit(df), p), getattr(rs, p))
+    # copies of a scaler carry a copy of its cache
+    for rs1 in (copy.deepcopy(rs), pickle.loads(pickle.dumps(rs))):
+        assert rs1.cache is not cache and len(rs1.cache._memory) == 1
+        pd.testing.assert_frame_equal(rs1.fit_transform(df), dfn)
+    # other parameters or data are other entries
+    rbt.robout_scaler(ignore=["time"], uppq=0.8, cache=cache).fit(df)
+    rbt.robout_scaler(ignore=["time"], cache=cache).fit(df.iloc[1:])
+    assert len(list(tmp_path.glob("*.npz"))) == 3
+
 def test_time():
     assert (time.time() - start_time)<30
\ No newline at end of file